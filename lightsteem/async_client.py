@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import time
+
+import backoff
+import requests
+
+try:
+    import aiohttp
+    NETWORK_EXCEPTIONS = (asyncio.TimeoutError, aiohttp.ClientError)
+except ImportError:
+    aiohttp = None
+    NETWORK_EXCEPTIONS = (asyncio.TimeoutError, )
+
+from .client import BoundAPI, Client, DEFAULT_NODES
+from .node_selector import NodeSelector
+
+
+class AsyncClient:
+    """asyncio flavour of the Client.
+
+    Every dynamic call (``client.get_block(1)``,
+    ``client('rc_api').find_rc_accounts(...)``) returns an awaitable
+    instead of blocking on the network.
+    """
+
+    def __init__(self, nodes=None, connect_timeout=3, read_timeout=30,
+                 loglevel=logging.ERROR, pool_maxsize=100,
+                 pool_idle_timeout=60, max_in_flight=100,
+                 failure_threshold=3, probe_interval=10):
+        if aiohttp is None:
+            raise RuntimeError(
+                "AsyncClient requires aiohttp. "
+                "Install it with: pip install lightsteem[async]")
+        self.nodes = nodes
+        self.node_selector = NodeSelector(
+            nodes or DEFAULT_NODES,
+            probe=self.probe_node,
+            failure_threshold=failure_threshold,
+            probe_interval=probe_interval,
+        )
+        # the default api type. client('..') doesn't change it.
+        self.api_type = "condenser_api"
+        self.queue = []
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_maxsize = pool_maxsize
+        self.pool_idle_timeout = pool_idle_timeout
+        self.max_in_flight = max_in_flight
+        self.current_node = None
+        self.logger = None
+        self.session = None
+        self.semaphore = None
+        self.set_logger(loglevel)
+        self.next_node()
+
+    # these don't touch the transport, share them with the sync client.
+    set_logger = Client.set_logger
+    pick_id_for_request = Client.pick_id_for_request
+    get_rpc_request_body = Client.get_rpc_request_body
+    validate_response = Client.validate_response
+
+    def __getattr__(self, attr):
+        def callable(*args, **kwargs):
+            return self.request(attr, *args, **kwargs)
+
+        return callable
+
+    def __call__(self, *args, **kwargs):
+        return BoundAPI(self, args[0])
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def next_node(self):
+        self.current_node = self.node_selector.best_node(
+            exclude=[self.current_node]) or self.current_node
+        self.logger.info("Node set as %s", self.current_node)
+
+    def get_session(self):
+        # aiohttp sessions should be created inside a running loop,
+        # so the pool is created with the first request.
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_maxsize,
+                keepalive_timeout=self.pool_idle_timeout,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=self.connect_timeout,
+                    sock_read=self.read_timeout,
+                ),
+            )
+            self.semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        return self.session
+
+    async def close(self):
+        self.node_selector.close()
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _send_request_once(self, url, request_data):
+        self.logger.info("Sending request: %s", request_data)
+        session = self.get_session()
+        async with self.semaphore:
+            async with session.post(url, json=request_data) as r:
+                r.raise_for_status()
+                return await r.json(content_type=None)
+
+    _send_request = backoff.on_exception(
+        backoff.expo, NETWORK_EXCEPTIONS, max_tries=5)(_send_request_once)
+
+    def probe_node(self, node):
+        # probes run in a background thread, outside of the event loop.
+        requests.post(node, json={
+            "jsonrpc": "2.0",
+            "method": "condenser_api.get_dynamic_global_properties",
+            "params": [],
+            "id": self.pick_id_for_request(),
+        }, timeout=(self.connect_timeout, self.read_timeout)
+        ).raise_for_status()
+
+    async def send_with_failover(self, request_data):
+        tried_nodes = []
+        while True:
+            node = self.node_selector.best_node(exclude=tried_nodes)
+            tried_nodes.append(node)
+            is_last_node = len(tried_nodes) >= len(self.node_selector.nodes)
+            if node != self.current_node:
+                self.logger.info("Node set as %s", node)
+                self.current_node = node
+
+            # don't insist on a node if there are others to try. retry
+            # the last one with backoff.
+            send_request = self._send_request if is_last_node \
+                else self._send_request_once
+            started_at = time.monotonic()
+            try:
+                response = await send_request(node, request_data)
+            except NETWORK_EXCEPTIONS as e:
+                self.logger.error(e)
+                self.node_selector.record_failure(node)
+                if is_last_node:
+                    raise e
+
+                self.logger.info("Retrying in another node: %s", request_data)
+                continue
+
+            self.node_selector.record_success(
+                node, time.monotonic() - started_at)
+            return response
+
+    def request(self, *args, **kwargs):
+        batch_data = kwargs.get("batch_data")
+        if batch_data:
+            request_data = batch_data
+        else:
+            request_data = self.get_rpc_request_body(
+                args, kwargs, api_type=kwargs.get("api_type"))
+
+        if kwargs.get("batch"):
+            self.queue.append(request_data)
+            return
+
+        return self._request(request_data)
+
+    async def _request(self, request_data):
+        response = await self.send_with_failover(request_data)
+        self.validate_response(response)
+
+        if isinstance(response, dict):
+            return response["result"]
+        elif isinstance(response, list):
+            return [r["result"] for r in response]
+
+        raise Exception("Unexpected response: %s" % response)
+
+    def process_batch(self):
+        batch_data, self.queue = self.queue, []
+        return self.request(batch_data=batch_data)
@@ -50,7 +50,7 @@ class Base58(object):
 
     def __init__(self, data, prefix=PREFIX):
         self._prefix = prefix
-        if all(c in string.hexdigits for c in data):
+        if HEXDIGITS.issuperset(data):
             self._hex = data
         elif data[0] == "5" or data[0] == "6":
             self._hex = base58CheckDecode(data)
@@ -109,45 +109,47 @@ class Base58(object):
 # https://github.com/tochev/python3-cryptocoins/raw/master/cryptocoins/base58.py
 BASE58_ALPHABET = b"123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
 
+# byte -> digit value, -1 for the bytes that aren't in the alphabet.
+BASE58_INDEX = [-1] * 256
+for index, byte in enumerate(BASE58_ALPHABET):
+    BASE58_INDEX[byte] = index
 
-def base58decode(base58_str):
+HEXDIGITS = frozenset(string.hexdigits)
+
+
+def b58decode(base58_str):
+    """Decodes a base58 string into bytes."""
     base58_text = base58_str.encode('ascii')
+    stripped = base58_text.lstrip(BASE58_ALPHABET[0:1])
     n = 0
-    leading_zeroes_count = 0
-    for b in base58_text:
-        n = n * 58 + BASE58_ALPHABET.find(b)
-        if n == 0:
-            leading_zeroes_count += 1
+    for b in stripped:
+        digit = BASE58_INDEX[b]
+        if digit < 0:
+            raise ValueError("Invalid base58 character: %r" % chr(b))
+        n = n * 58 + digit
+    return b"\0" * (len(base58_text) - len(stripped)) + \
+        n.to_bytes((n.bit_length() + 7) // 8, "big")
+
+
+def b58encode(data):
+    """Encodes bytes into a base58 string."""
+    stripped = data.lstrip(b"\0")
+    n = int.from_bytes(stripped, "big")
     res = bytearray()
-    while n >= 256:
-        div, mod = divmod(n, 256)
-        res.insert(0, mod)
-        n = div
-    else:
-        res.insert(0, n)
-    return hexlify(bytearray(1) * leading_zeroes_count + res).decode('ascii')
+    while n:
+        n, mod = divmod(n, 58)
+        res.append(BASE58_ALPHABET[mod])
+    res.reverse()
+    return (BASE58_ALPHABET[0:1] * (len(data) - len(stripped)) +
+            res).decode('ascii')
 
 
-def base58encode(hexstring):
-    byteseq = compat_bytes(hexstring, 'ascii')
-    byteseq = unhexlify(byteseq)
-    byteseq = compat_bytes(byteseq)
+def base58decode(base58_str):
+    return hexlify(b58decode(base58_str)).decode('ascii')
 
-    n = 0
-    leading_zeroes_count = 0
-    for c in byteseq:
-        n = n * 256 + c
-        if n == 0:
-            leading_zeroes_count += 1
-    res = bytearray()
-    while n >= 58:
-        div, mod = divmod(n, 58)
-        res.insert(0, BASE58_ALPHABET[mod])
-        n = div
-    else:
-        res.insert(0, BASE58_ALPHABET[n])
 
-    return (BASE58_ALPHABET[0:1] * leading_zeroes_count + res).decode('ascii')
+def base58encode(hexstring):
+    return b58encode(unhexlify(compat_bytes(hexstring, 'ascii')))
 
 
 def ripemd160(s):
@@ -160,30 +162,46 @@ def doublesha256(s):
     return hashlib.sha256(hashlib.sha256(unhexlify(s)).digest()).digest()
 
 
+def b58check_encode(version, payload):
+    """Bytes version of ``base58CheckEncode``."""
+    data = bytes((version, )) + payload
+    checksum = hashlib.sha256(hashlib.sha256(data).digest()).digest()[:4]
+    return b58encode(data + checksum)
+
+
+def b58check_decode(s):
+    """Bytes version of ``base58CheckDecode``."""
+    data = b58decode(s)
+    checksum = hashlib.sha256(hashlib.sha256(data[:-4]).digest()).digest()
+    assert (data[-4:] == checksum[:4])
+    return data[1:-4]
+
+
+def gph_b58check_encode(payload):
+    """Bytes version of ``gphBase58CheckEncode``."""
+    checksum = hashlib.new('ripemd160', payload).digest()[:4]
+    return b58encode(payload + checksum)
+
+
+def gph_b58check_decode(s):
+    """Bytes version of ``gphBase58CheckDecode``."""
+    data = b58decode(s)
+    checksum = hashlib.new('ripemd160', data[:-4]).digest()[:4]
+    assert (data[-4:] == checksum)
+    return data[:-4]
+
+
 def base58CheckEncode(version, payload):
-    s = ('%.2x' % version) + payload
-    checksum = doublesha256(s)[:4]
-    result = s + hexlify(checksum).decode('ascii')
-    return base58encode(result)
+    return b58check_encode(version, unhexlify(payload))
 
 
 def base58CheckDecode(s):
-    s = unhexlify(base58decode(s))
-    dec = hexlify(s[:-4]).decode('ascii')
-    checksum = doublesha256(dec)[:4]
-    assert (s[-4:] == checksum)
-    return dec[2:]
+    return hexlify(b58check_decode(s)).decode('ascii')
 
 
 def gphBase58CheckEncode(s):
-    checksum = ripemd160(s)[:4]
-    result = s + hexlify(checksum).decode('ascii')
-    return base58encode(result)
+    return gph_b58check_encode(unhexlify(s))
 
 
 def gphBase58CheckDecode(s):
-    s = unhexlify(base58decode(s))
-    dec = hexlify(s[:-4]).decode('ascii')
-    checksum = ripemd160(dec)[:4]
-    assert (s[-4:] == checksum)
-    return dec
+    return hexlify(gph_b58check_decode(s)).decode('ascii')
@@ -1,6 +1,6 @@
 from .utils import compat_bytes
 
-from .base58 import Base58, ripemd160
+from .base58 import Base58, ripemd160, b58decode, gph_b58check_encode
 from binascii import hexlify, unhexlify
 
 import ecdsa
@@ -11,6 +11,64 @@ This classes are mostly derived from
 https://github.com/steemit/steem-python/blob/master/steembase/account.py
 """
 
+# copying a hash object is cheaper than looking it up by name. created on
+# the first use, so importing doesn't fail if OpenSSL has no ripemd160.
+_RIPEMD160 = None
+
+
+def _ripemd160(data):
+    global _RIPEMD160
+    if _RIPEMD160 is None:
+        _RIPEMD160 = hashlib.new('ripemd160')
+    h = _RIPEMD160.copy()
+    h.update(data)
+    return h.digest()
+
+
+def _decode_public_key(key, prefix):
+    """Returns the (33 byte key, 4 byte checksum) of a base58 encoded
+    public key, or None if it's not a valid one."""
+    if not key.startswith(prefix):
+        return None
+    try:
+        data = b58decode(key[len(prefix):])
+    except ValueError:
+        return None
+    if len(data) != 37 or data[0] not in (2, 3):
+        return None
+    key_bytes, checksum = data[:33], data[33:]
+    if _ripemd160(key_bytes)[:4] != checksum:
+        return None
+    return key_bytes, checksum
+
+
+def decode_public_keys(keys, prefix="STM", verify_only=False):
+    """Decodes the public keys (``STM...`` strings) in bulk.
+
+    Yields (33 byte key, 4 byte checksum) tuples for every key, None for
+    the invalid ones. With ``verify_only``, yields True or False
+    instead.
+    """
+    for key in keys:
+        decoded = _decode_public_key(key, prefix)
+        yield decoded is not None if verify_only else decoded
+
+
+def derive_addresses(keys, prefix="STM"):
+    """Yields the addresses of the public keys (``STM...`` strings or
+    33 byte keys), None for the invalid ones. Same as
+    ``str(PublicKey(key).address)``.
+    """
+    for key in keys:
+        if isinstance(key, str):
+            decoded = _decode_public_key(key, prefix)
+            if decoded is None:
+                yield None
+                continue
+            key = decoded[0]
+        yield prefix + gph_b58check_encode(
+            _ripemd160(hashlib.sha512(key).digest()))
+
 
 class Address(object):
     """ Address class
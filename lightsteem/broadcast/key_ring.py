@@ -0,0 +1,205 @@
+import hashlib
+import struct
+import threading
+import time
+from binascii import hexlify
+from collections import deque
+
+import ecdsa
+
+from .key_objects import PrivateKey
+from .utils import compat_bytes
+
+try:
+    import secp256k1
+    USE_SECP256K1 = True
+except ImportError:
+    USE_SECP256K1 = False
+
+
+def is_canonical(sig):
+    return (not (sig[0] & 0x80)
+            and not (sig[0] == 0 and not (sig[1] & 0x80))
+            and not (sig[32] & 0x80)
+            and not (sig[32] == 0 and not (sig[33] & 0x80)))
+
+
+def recover_public_key(digest, signature, i):
+    curve = ecdsa.SECP256k1.curve
+    G = ecdsa.SECP256k1.generator
+    order = ecdsa.SECP256k1.order
+    yp = (i % 2)
+    r, s = ecdsa.util.sigdecode_string(signature, order)
+    x = r + (i // 2) * order
+    alpha = ((x * x * x) + (curve.a() * x) + curve.b()) % curve.p()
+    beta = ecdsa.numbertheory.square_root_mod_prime(alpha, curve.p())
+    y = beta if (beta - yp) % 2 == 0 else curve.p() - beta
+    R = ecdsa.ellipticcurve.Point(curve, x, y, order)
+    e = ecdsa.util.string_to_number(digest)
+    Q = ecdsa.numbertheory.inverse_mod(r, order) * (s * R +
+                                                    (-e % order) * G)
+    if not ecdsa.VerifyingKey.from_public_point(
+            Q, curve=ecdsa.SECP256k1).verify_digest(
+                signature, digest, sigdecode=ecdsa.util.sigdecode_string):
+        return None
+    return ecdsa.VerifyingKey.from_public_point(Q, curve=ecdsa.SECP256k1)
+
+
+def compressed_pubkey(pk):
+    order = pk.curve.generator.order()
+    p = pk.pubkey.point
+    x_str = ecdsa.util.number_to_string(p.x(), order)
+    return compat_bytes(chr(2 + (p.y() & 1)), 'ascii') + x_str
+
+
+class CachedKey:
+    """A private key with everything derived from it that signing needs.
+    Derived once and reused for every signature.
+    """
+
+    def __init__(self, wif, prefix="STM"):
+        self.wif = wif
+        self.private_key = PrivateKey(wif, prefix=prefix)
+        self.secret = compat_bytes(self.private_key)
+        self._secp256k1_key = None
+        self._ecdsa_key = None
+
+    @property
+    def secp256k1_key(self):
+        if self._secp256k1_key is None:
+            self._secp256k1_key = secp256k1.PrivateKey(self.secret, raw=True)
+        return self._secp256k1_key
+
+    @property
+    def ecdsa_key(self):
+        if self._ecdsa_key is None:
+            self._ecdsa_key = ecdsa.SigningKey.from_string(
+                self.secret, curve=ecdsa.SECP256k1)
+        return self._ecdsa_key
+
+    def _sign_secp256k1(self, digest):
+        privkey = self.secp256k1_key
+        ndata = secp256k1.ffi.new("const int *ndata")
+        ndata[0] = 0
+        while True:
+            ndata[0] += 1
+            sig = secp256k1.ffi.new(
+                'secp256k1_ecdsa_recoverable_signature *')
+            signed = secp256k1.lib.secp256k1_ecdsa_sign_recoverable(
+                privkey.ctx, sig, digest, privkey.private_key,
+                secp256k1.ffi.NULL, ndata)
+            assert signed == 1
+            signature, i = privkey.ecdsa_recoverable_serialize(sig)
+            if is_canonical(signature):
+                return i, signature
+
+    def _sign_ecdsa(self, digest):
+        curve = ecdsa.SECP256k1
+        order = curve.order
+        secret_multiplier = self.ecdsa_key.privkey.secret_multiplier
+        e = ecdsa.util.string_to_number(digest)
+        counter = 0
+        while True:
+            # deterministic nonce, a new one for every retry.
+            counter += 1
+            k = ecdsa.rfc6979.generate_k(
+                order, secret_multiplier, hashlib.sha256,
+                hashlib.sha256(digest + struct.pack("<I", counter)).digest())
+
+            point = k * curve.generator
+            r = point.x() % order
+            if r == 0:
+                continue
+            s = ecdsa.numbertheory.inverse_mod(k, order) * (
+                e + r * secret_multiplier) % order
+            if s == 0:
+                continue
+
+            # the recovery id is known from R, no need to recover the
+            # public key four times to find it.
+            i = (point.y() & 1) | (2 if point.x() >= order else 0)
+            if s > order // 2:
+                # low S. (-s is also valid, with the other R.y)
+                s = order - s
+                i ^= 1
+
+            signature = ecdsa.util.sigencode_string(r, s, order)
+            if is_canonical(signature):
+                return i, signature
+
+    def sign(self, digest):
+        """Returns the compact (recoverable) signature of the digest
+        as a hex string.
+        """
+        if USE_SECP256K1:
+            i, signature = self._sign_secp256k1(digest)
+        else:
+            i, signature = self._sign_ecdsa(digest)
+        # compressed key and the recovery id.
+        i += 4
+        i += 27
+        sigstr = struct.pack("<B", i)
+        sigstr += signature
+        return hexlify(sigstr).decode('ascii')
+
+
+class KeyRing:
+    """The private keys of a Client.
+
+    Behaves like the list of WIFs it's created with, but every key is
+    parsed and derived only once, and signing times are recorded.
+    """
+
+    def __init__(self, keys=None, prefix="STM", timings_size=1000):
+        self.keys = list(keys or [])
+        self.prefix = prefix
+        self.cached_keys = {}
+        self.signature_count = 0
+        self.signature_timings = deque(maxlen=timings_size)
+        self.lock = threading.Lock()
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, index):
+        return self.keys[index]
+
+    def __repr__(self):
+        return "<KeyRing: %s keys>" % len(self.keys)
+
+    def append(self, wif):
+        self.keys.append(wif)
+
+    def get(self, wif):
+        if wif not in self.cached_keys:
+            self.cached_keys[wif] = CachedKey(wif, prefix=self.prefix)
+        return self.cached_keys[wif]
+
+    def sign(self, digest):
+        """Signs the digest with every key in the ring. Returns the
+        signatures as hex strings.
+        """
+        signatures = []
+        for wif in self.keys:
+            key = self.get(wif)
+            started_at = time.perf_counter()
+            signatures.append(key.sign(digest))
+            with self.lock:
+                self.signature_timings.append(
+                    time.perf_counter() - started_at)
+                self.signature_count += 1
+        return signatures
+
+    @property
+    def signature_stats(self):
+        """Timings (in seconds) of the recent signatures."""
+        timings = list(self.signature_timings)
+        return {
+            "count": self.signature_count,
+            "last": timings[-1] if timings else None,
+            "average": sum(timings) / len(timings) if timings else None,
+            "max": max(timings) if timings else None,
+        }
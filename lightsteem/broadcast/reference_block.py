@@ -0,0 +1,84 @@
+import struct
+import threading
+import time
+from binascii import unhexlify
+from datetime import timedelta
+
+from dateutil.parser import parse
+
+
+class ReferenceBlockCache:
+    """Keeps the reference block (TaPoS) information the transactions
+    need, so every broadcast doesn't have to ask the node.
+
+    A reference block is valid for a long time (2^16 blocks), it's
+    refreshed in the background when it's older than ``ttl / 2`` seconds
+    and refreshed right away when it's older than ``ttl`` seconds.
+    The expiration is calculated from the cached head block time and the
+    time passed since we fetched it.
+    """
+
+    def __init__(self, client, ttl=60):
+        self.client = client
+        self.ttl = ttl
+        self.reference = None
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+    def call(self, method, *params):
+        return getattr(self.client('condenser_api'), method)(*params)
+
+    def fetch(self):
+        properties = self.call("get_dynamic_global_properties")
+        head_block_number = properties["head_block_number"]
+        ref_block = self.call("get_block", head_block_number - 2)
+        return {
+            "ref_block_num": head_block_number - 3 & 0xFFFF,
+            "ref_block_prefix": struct.unpack_from("<I", unhexlify(
+                ref_block["previous"]), 4)[0],
+            "head_block_time": parse(properties["time"]),
+            "fetched_at": time.monotonic(),
+        }
+
+    def refresh(self):
+        reference = self.fetch()
+        with self.lock:
+            self.reference = reference
+        return reference
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            self.client.logger.error(
+                "Couldn't refresh the reference block: %s", e)
+        finally:
+            self.refreshing = False
+
+    def get(self):
+        with self.lock:
+            reference = self.reference
+            age = time.monotonic() - reference["fetched_at"] \
+                if reference else None
+            refresh_in_background = age is not None and \
+                self.ttl / 2 < age <= self.ttl and not self.refreshing
+            if refresh_in_background:
+                self.refreshing = True
+
+        if age is None or age > self.ttl:
+            return self.refresh()
+
+        if refresh_in_background:
+            threading.Thread(
+                target=self._refresh_in_background, daemon=True).start()
+
+        return reference
+
+    def invalidate(self):
+        with self.lock:
+            self.reference = None
+
+    def get_expiration(self, reference, seconds=30):
+        elapsed = time.monotonic() - reference["fetched_at"]
+        return reference["head_block_time"] + timedelta(
+            seconds=elapsed + seconds)
@@ -0,0 +1,560 @@
+import calendar
+import struct
+from binascii import unhexlify
+from datetime import datetime
+
+from lightsteem.datastructures import OPERATION_IDS
+from .key_objects import PublicKey
+
+"""
+Binary serialization of the transactions, byte-identical with the
+steemd's fc::raw::pack output. (What condenser_api.get_transaction_hex
+returns.)
+
+Operations are passed in the condenser_api format, the same format
+Operation namedtuples carry.
+"""
+
+ASSET_PRECISIONS = {
+    "STEEM": 3,
+    "SBD": 3,
+    "TESTS": 3,
+    "TBD": 3,
+    "VESTS": 6,
+}
+
+NAI_SYMBOLS = {
+    "@@000000013": "SBD",
+    "@@000000021": "STEEM",
+    "@@000000037": "VESTS",
+}
+
+
+def varint(n):
+    data = bytearray()
+    while n >= 0x80:
+        data.append((n & 0x7F) | 0x80)
+        n >>= 7
+    data.append(n)
+    return bytes(data)
+
+
+def uint8(n):
+    return struct.pack("<B", n)
+
+
+def uint16(n):
+    return struct.pack("<H", int(n))
+
+
+def int16(n):
+    return struct.pack("<h", int(n))
+
+
+def uint32(n):
+    return struct.pack("<I", int(n))
+
+
+def int64(n):
+    return struct.pack("<q", int(n))
+
+
+def boolean(value):
+    return uint8(1 if value else 0)
+
+
+def string(value):
+    data = (value or "").encode("utf8")
+    return varint(len(data)) + data
+
+
+def binary(value):
+    # vector<char>, passed as a hex string.
+    data = unhexlify(value or "")
+    return varint(len(data)) + data
+
+
+def time_point_sec(value):
+    timestamp = datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S")
+    return uint32(calendar.timegm(timestamp.timetuple()))
+
+
+def asset(value):
+    if isinstance(value, dict):
+        symbol = NAI_SYMBOLS.get(value["nai"])
+        if symbol is None:
+            raise NotImplementedError("Unknown asset: %s" % value["nai"])
+        return (int64(value["amount"]) + uint8(value["precision"])
+                + symbol.encode("ascii").ljust(7, b"\x00"))
+
+    amount, symbol = value.split()
+    whole, _, fraction = amount.partition(".")
+    precision = ASSET_PRECISIONS.get(symbol, len(fraction))
+    satoshis = int(whole + fraction.ljust(precision, "0")[:precision])
+    return (int64(satoshis) + uint8(precision)
+            + symbol.encode("ascii").ljust(7, b"\x00"))
+
+
+def public_key(value):
+    return bytes(PublicKey(value, prefix=value[:3]))
+
+
+def empty_by_default(serializer):
+    # the node fills the missing fields with their defaults. it's safe to
+    # pack these as empty. (the other defaults are not known here.)
+    serializer.empty_by_default = True
+    return serializer
+
+
+def array(serializer):
+    @empty_by_default
+    def serialize(values):
+        values = values or []
+        return varint(len(values)) + b"".join(serializer(v) for v in values)
+
+    return serialize
+
+
+def flat_set(serializer):
+    # flat sets are kept sorted on the node side.
+    @empty_by_default
+    def serialize(values):
+        return array(serializer)(sorted(values or []))
+
+    return serialize
+
+
+def optional(serializer):
+    @empty_by_default
+    def serialize(value):
+        if value is None:
+            return uint8(0)
+        return uint8(1) + serializer(value)
+
+    return serialize
+
+
+def struct_of(fields):
+    def serialize(value):
+        data = b""
+        for name, serializer in fields:
+            if name not in value and \
+                    not getattr(serializer, "empty_by_default", False):
+                # we don't know the node's default, let the node do it.
+                raise NotImplementedError("Missing field: %s" % name)
+            data += serializer(value.get(name))
+        return data
+
+    return serialize
+
+
+def authority(value):
+    account_auths = sorted(
+        (account, weight) for account, weight in value["account_auths"])
+    key_auths = sorted(
+        (public_key(key), weight) for key, weight in value["key_auths"])
+    return (
+        uint32(value["weight_threshold"])
+        + varint(len(account_auths))
+        + b"".join(string(a) + uint16(w) for a, w in account_auths)
+        + varint(len(key_auths))
+        + b"".join(k + uint16(w) for k, w in key_auths)
+    )
+
+
+@empty_by_default
+def future_extensions(value):
+    if value:
+        raise NotImplementedError("Extensions are not supported.")
+    return varint(0)
+
+
+def witness_properties(value):
+    # flat_map<string, vector<char>>, passed as [[key, hex], ...]
+    props = sorted(value)
+    return varint(len(props)) + b"".join(
+        string(k) + binary(v) for k, v in props)
+
+
+price = struct_of([
+    ("base", asset),
+    ("quote", asset),
+])
+
+chain_properties = struct_of([
+    ("account_creation_fee", asset),
+    ("maximum_block_size", uint32),
+    ("sbd_interest_rate", uint16),
+])
+
+beneficiaries = array(struct_of([
+    ("account", string),
+    ("weight", uint16),
+]))
+
+# static_variant<comment_payout_beneficiaries>, in the variant order.
+COMMENT_OPTIONS_EXTENSIONS = [
+    ("comment_payout_beneficiaries", struct_of([
+        ("beneficiaries", beneficiaries),
+    ])),
+]
+
+
+@empty_by_default
+def comment_options_extensions(value):
+    value = value or []
+    extension_types = [name for name, _ in COMMENT_OPTIONS_EXTENSIONS]
+    data = varint(len(value))
+    for extension in value:
+        if isinstance(extension, dict):
+            # appbase format: {"type": "..", "value": {..}}
+            if extension["type"] not in extension_types:
+                raise NotImplementedError(
+                    "Unknown extension: %s" % extension["type"])
+            extension_type = extension_types.index(extension["type"])
+            extension_value = extension["value"]
+        else:
+            # condenser format: [0, {..}]
+            extension_type, extension_value = extension
+            if extension_type >= len(extension_types):
+                raise NotImplementedError(
+                    "Unknown extension: %s" % extension_type)
+        data += varint(extension_type) + COMMENT_OPTIONS_EXTENSIONS[
+            extension_type][1](extension_value)
+    return data
+
+
+OPERATION_FIELDS = {
+    "vote": [
+        ("voter", string),
+        ("author", string),
+        ("permlink", string),
+        ("weight", int16),
+    ],
+    "comment": [
+        ("parent_author", string),
+        ("parent_permlink", string),
+        ("author", string),
+        ("permlink", string),
+        ("title", string),
+        ("body", string),
+        ("json_metadata", string),
+    ],
+    "transfer": [
+        ("from", string),
+        ("to", string),
+        ("amount", asset),
+        ("memo", string),
+    ],
+    "transfer_to_vesting": [
+        ("from", string),
+        ("to", string),
+        ("amount", asset),
+    ],
+    "withdraw_vesting": [
+        ("account", string),
+        ("vesting_shares", asset),
+    ],
+    "limit_order_create": [
+        ("owner", string),
+        ("orderid", uint32),
+        ("amount_to_sell", asset),
+        ("min_to_receive", asset),
+        ("fill_or_kill", boolean),
+        ("expiration", time_point_sec),
+    ],
+    "limit_order_cancel": [
+        ("owner", string),
+        ("orderid", uint32),
+    ],
+    "feed_publish": [
+        ("publisher", string),
+        ("exchange_rate", price),
+    ],
+    "convert": [
+        ("owner", string),
+        ("requestid", uint32),
+        ("amount", asset),
+    ],
+    "account_create": [
+        ("fee", asset),
+        ("creator", string),
+        ("new_account_name", string),
+        ("owner", authority),
+        ("active", authority),
+        ("posting", authority),
+        ("memo_key", public_key),
+        ("json_metadata", string),
+    ],
+    "account_update": [
+        ("account", string),
+        ("owner", optional(authority)),
+        ("active", optional(authority)),
+        ("posting", optional(authority)),
+        ("memo_key", public_key),
+        ("json_metadata", string),
+    ],
+    "witness_update": [
+        ("owner", string),
+        ("url", string),
+        ("block_signing_key", public_key),
+        ("props", chain_properties),
+        ("fee", asset),
+    ],
+    "account_witness_vote": [
+        ("account", string),
+        ("witness", string),
+        ("approve", boolean),
+    ],
+    "account_witness_proxy": [
+        ("account", string),
+        ("proxy", string),
+    ],
+    "custom": [
+        ("required_auths", flat_set(string)),
+        ("id", uint16),
+        ("data", binary),
+    ],
+    "delete_comment": [
+        ("author", string),
+        ("permlink", string),
+    ],
+    "custom_json": [
+        ("required_auths", flat_set(string)),
+        ("required_posting_auths", flat_set(string)),
+        ("id", string),
+        ("json", string),
+    ],
+    "comment_options": [
+        ("author", string),
+        ("permlink", string),
+        ("max_accepted_payout", asset),
+        ("percent_steem_dollars", uint16),
+        ("allow_votes", boolean),
+        ("allow_curation_rewards", boolean),
+        ("extensions", comment_options_extensions),
+    ],
+    "set_withdraw_vesting_route": [
+        ("from_account", string),
+        ("to_account", string),
+        ("percent", uint16),
+        ("auto_vest", boolean),
+    ],
+    "limit_order_create2": [
+        ("owner", string),
+        ("orderid", uint32),
+        ("amount_to_sell", asset),
+        ("exchange_rate", price),
+        ("fill_or_kill", boolean),
+        ("expiration", time_point_sec),
+    ],
+    "claim_account": [
+        ("creator", string),
+        ("fee", asset),
+        ("extensions", future_extensions),
+    ],
+    "create_claimed_account": [
+        ("creator", string),
+        ("new_account_name", string),
+        ("owner", authority),
+        ("active", authority),
+        ("posting", authority),
+        ("memo_key", public_key),
+        ("json_metadata", string),
+        ("extensions", future_extensions),
+    ],
+    "request_account_recovery": [
+        ("recovery_account", string),
+        ("account_to_recover", string),
+        ("new_owner_authority", authority),
+        ("extensions", future_extensions),
+    ],
+    "recover_account": [
+        ("account_to_recover", string),
+        ("new_owner_authority", authority),
+        ("recent_owner_authority", authority),
+        ("extensions", future_extensions),
+    ],
+    "change_recovery_account": [
+        ("account_to_recover", string),
+        ("new_recovery_account", string),
+        ("extensions", future_extensions),
+    ],
+    "escrow_transfer": [
+        ("from", string),
+        ("to", string),
+        ("agent", string),
+        ("escrow_id", uint32),
+        ("sbd_amount", asset),
+        ("steem_amount", asset),
+        ("fee", asset),
+        ("ratification_deadline", time_point_sec),
+        ("escrow_expiration", time_point_sec),
+        ("json_meta", string),
+    ],
+    "escrow_dispute": [
+        ("from", string),
+        ("to", string),
+        ("agent", string),
+        ("who", string),
+        ("escrow_id", uint32),
+    ],
+    "escrow_release": [
+        ("from", string),
+        ("to", string),
+        ("agent", string),
+        ("who", string),
+        ("receiver", string),
+        ("escrow_id", uint32),
+        ("sbd_amount", asset),
+        ("steem_amount", asset),
+    ],
+    "escrow_approve": [
+        ("from", string),
+        ("to", string),
+        ("agent", string),
+        ("who", string),
+        ("escrow_id", uint32),
+        ("approve", boolean),
+    ],
+    "transfer_to_savings": [
+        ("from", string),
+        ("to", string),
+        ("amount", asset),
+        ("memo", string),
+    ],
+    "transfer_from_savings": [
+        ("from", string),
+        ("request_id", uint32),
+        ("to", string),
+        ("amount", asset),
+        ("memo", string),
+    ],
+    "cancel_transfer_from_savings": [
+        ("from", string),
+        ("request_id", uint32),
+    ],
+    "custom_binary": [
+        ("required_owner_auths", flat_set(string)),
+        ("required_active_auths", flat_set(string)),
+        ("required_posting_auths", flat_set(string)),
+        ("required_auths", array(authority)),
+        ("id", string),
+        ("data", binary),
+    ],
+    "decline_voting_rights": [
+        ("account", string),
+        ("decline", boolean),
+    ],
+    "reset_account": [
+        ("reset_account", string),
+        ("account_to_reset", string),
+        ("new_owner_authority", authority),
+    ],
+    "set_reset_account": [
+        ("account", string),
+        ("current_reset_account", string),
+        ("reset_account", string),
+    ],
+    "claim_reward_balance": [
+        ("account", string),
+        ("reward_steem", asset),
+        ("reward_sbd", asset),
+        ("reward_vests", asset),
+    ],
+    "delegate_vesting_shares": [
+        ("delegator", string),
+        ("delegatee", string),
+        ("vesting_shares", asset),
+    ],
+    "account_create_with_delegation": [
+        ("fee", asset),
+        ("delegation", asset),
+        ("creator", string),
+        ("new_account_name", string),
+        ("owner", authority),
+        ("active", authority),
+        ("posting", authority),
+        ("memo_key", public_key),
+        ("json_metadata", string),
+        ("extensions", future_extensions),
+    ],
+    "witness_set_properties": [
+        ("owner", string),
+        ("props", witness_properties),
+        ("extensions", future_extensions),
+    ],
+    "account_update2": [
+        ("account", string),
+        ("owner", optional(authority)),
+        ("active", optional(authority)),
+        ("posting", optional(authority)),
+        ("memo_key", optional(public_key)),
+        ("json_metadata", string),
+        ("posting_json_metadata", string),
+        ("extensions", future_extensions),
+    ],
+    "create_proposal": [
+        ("creator", string),
+        ("receiver", string),
+        ("start_date", time_point_sec),
+        ("end_date", time_point_sec),
+        ("daily_pay", asset),
+        ("subject", string),
+        ("permlink", string),
+        ("extensions", future_extensions),
+    ],
+    "update_proposal_votes": [
+        ("voter", string),
+        ("proposal_ids", flat_set(int64)),
+        ("approve", boolean),
+        ("extensions", future_extensions),
+    ],
+    "remove_proposal": [
+        ("proposal_owner", string),
+        ("proposal_ids", flat_set(int64)),
+        ("extensions", future_extensions),
+    ],
+}
+
+OPERATION_SERIALIZERS = {
+    op_type: struct_of(fields) for op_type, fields in OPERATION_FIELDS.items()
+}
+
+
+def operation(value):
+    if isinstance(value, dict):
+        # appbase format: {"type": "vote_operation", "value": {..}}
+        op_type = value["type"][:-len("_operation")]
+        op_data = value["value"]
+    else:
+        op_type, op_data = value
+
+    if op_type not in OPERATION_SERIALIZERS:
+        raise NotImplementedError(
+            "Serialization of %s is not supported." % op_type)
+
+    return varint(OPERATION_IDS[op_type]) + \
+        OPERATION_SERIALIZERS[op_type](op_data)
+
+
+def signature(value):
+    return unhexlify(value)
+
+
+transaction = struct_of([
+    ("ref_block_num", uint16),
+    ("ref_block_prefix", uint32),
+    ("expiration", time_point_sec),
+    ("operations", array(operation)),
+    ("extensions", future_extensions),
+    ("signatures", array(signature)),
+])
+
+
+def serialize_transaction(tx):
+    """Returns the binary representation of a (signed) transaction.
+    Raises NotImplementedError if the transaction has something we
+    can't serialize locally.
+    """
+    return transaction(tx)
@@ -1,45 +1,53 @@
-import array
 import hashlib
-import struct
-import time
+import os
+from concurrent.futures import ProcessPoolExecutor
 from binascii import hexlify
 from binascii import unhexlify
 from collections import OrderedDict
-from datetime import timedelta
-
-import ecdsa
-from dateutil.parser import parse
 
 from .chains import known_chains
-from .key_objects import PrivateKey
-from .utils import compat_bytes
-
-try:
+from .key_ring import (
+    USE_SECP256K1,
+    KeyRing,
+    compressed_pubkey,
+    is_canonical,
+    recover_public_key,
+)
+from .reference_block import ReferenceBlockCache
+from .serializer import serialize_transaction
+
+if USE_SECP256K1:
     import secp256k1
-    USE_SECP256K1 = True
-except ImportError:
-    USE_SECP256K1 = False
+
+
+# key rings of the process pool workers, parsed once per worker.
+_worker_key_rings = {}
+
+
+def _sign_digests(keys, digests):
+    keys = tuple(keys)
+    if keys not in _worker_key_rings:
+        _worker_key_rings[keys] = KeyRing(keys)
+    key_ring = _worker_key_rings[keys]
+    return [key_ring.sign(digest) for digest in digests]
 
 
 class TransactionBuilder:
 
-    def __init__(self, client):
+    def __init__(self, client, reference_block_ttl=60):
         self.client = client
         self.transaction = OrderedDict()
         self.message = None
         self.digest = None
+        self.reference_block_cache = ReferenceBlockCache(
+            client, ttl=reference_block_ttl)
 
     def prepare(self):
-        properties = self.client.get_dynamic_global_properties()
-        ref_block_num = properties["head_block_number"] - 3 & 0xFFFF
-        ref_block = self.client.get_block(properties["head_block_number"] - 2)
-        ref_block_prefix = struct.unpack_from("<I", unhexlify(
-            ref_block["previous"]), 4)[0]
-        expiration = (
-                parse(properties["time"]) + timedelta(seconds=30)
-        ).strftime('%Y-%m-%dT%H:%M:%S%Z')
-        self.transaction["ref_block_num"] = ref_block_num
-        self.transaction["ref_block_prefix"] = ref_block_prefix
+        reference = self.reference_block_cache.get()
+        expiration = self.reference_block_cache.get_expiration(
+            reference, seconds=30).strftime('%Y-%m-%dT%H:%M:%S%Z')
+        self.transaction["ref_block_num"] = reference["ref_block_num"]
+        self.transaction["ref_block_prefix"] = reference["ref_block_prefix"]
         self.transaction["expiration"] = expiration
 
         return self
@@ -58,37 +66,33 @@ class TransactionBuilder:
 
         return chain_params
 
+    def get_transaction_hex(self, transaction):
+        try:
+            return hexlify(serialize_transaction(transaction)).decode('ascii')
+        except NotImplementedError as e:
+            # ask the node if we can't serialize it locally.
+            self.client.logger.info(
+                "Local serialization failed, using the node: %s", e)
+            return self.client.get_transaction_hex(transaction)
+
+    def get_digest(self, chain, hex):
+        """Returns the digest to sign. Doesn't touch the builder, so
+        it's safe to call from multiple threads."""
+        chain_id = self.get_chain_params(chain)["chain_id"]
+        return hashlib.sha256(unhexlify(chain_id + hex[0:-2])).digest()
+
     def derive_digest(self, chain, hex):
         chain_params = self.get_chain_params(chain)
         self.chainid = chain_params["chain_id"]
         self.message = unhexlify(self.chainid + hex[0:-2])
         self.digest = hashlib.sha256(self.message).digest()
+        return self.digest
 
     def recover_public_key(self, digest, signature, i):
-        curve = ecdsa.SECP256k1.curve
-        G = ecdsa.SECP256k1.generator
-        order = ecdsa.SECP256k1.order
-        yp = (i % 2)
-        r, s = ecdsa.util.sigdecode_string(signature, order)
-        x = r + (i // 2) * order
-        alpha = ((x * x * x) + (curve.a() * x) + curve.b()) % curve.p()
-        beta = ecdsa.numbertheory.square_root_mod_prime(alpha, curve.p())
-        y = beta if (beta - yp) % 2 == 0 else curve.p() - beta
-        R = ecdsa.ellipticcurve.Point(curve, x, y, order)
-        e = ecdsa.util.string_to_number(digest)
-        Q = ecdsa.numbertheory.inverse_mod(r, order) * (s * R +
-                                                        (-e % order) * G)
-        if not ecdsa.VerifyingKey.from_public_point(
-                Q, curve=ecdsa.SECP256k1).verify_digest(
-                    signature, digest, sigdecode=ecdsa.util.sigdecode_string):
-            return None
-        return ecdsa.VerifyingKey.from_public_point(Q, curve=ecdsa.SECP256k1)
+        return recover_public_key(digest, signature, i)
 
     def compressed_pubkey(self, pk):
-        order = pk.curve.generator.order()
-        p = pk.pubkey.point
-        x_str = ecdsa.util.number_to_string(p.x(), order)
-        return compat_bytes(chr(2 + (p.y() & 1)), 'ascii') + x_str
+        return compressed_pubkey(pk)
 
     def recover_pubkey_parameter(self, digest, signature, pubkey):
         for i in range(0, 4):
@@ -106,96 +110,81 @@ class TransactionBuilder:
         return None
 
     def _is_canonical(self, sig):
-        return (not (sig[0] & 0x80)
-                and not (sig[0] == 0 and not (sig[1] & 0x80))
-                and not (sig[32] & 0x80)
-                and not (sig[32] == 0 and not (sig[33] & 0x80)))
+        return is_canonical(sig)
 
-    def broadcast(self, operations, chain=None, dry_run=False):
-        preferred_api_type = self.client.api_type
+    def build_transaction(self, operations, reference=None):
         if not isinstance(operations, list):
             operations = [operations, ]
 
-        self.prepare()
-
-        op_list = []
-        for operation in operations:
-            op_list.append(
-                [operation.op_id, operation.op_data],
-            )
-
-        self.transaction["operations"] = op_list
-        self.transaction["extensions"] = []
-        self.transaction["signatures"] = []
+        reference = reference or self.reference_block_cache.get()
+        expiration = self.reference_block_cache.get_expiration(
+            reference, seconds=30).strftime('%Y-%m-%dT%H:%M:%S%Z')
+
+        transaction = OrderedDict()
+        transaction["ref_block_num"] = reference["ref_block_num"]
+        transaction["ref_block_prefix"] = reference["ref_block_prefix"]
+        transaction["expiration"] = expiration
+        transaction["operations"] = [
+            [operation.op_id, operation.op_data] for operation in operations]
+        transaction["extensions"] = []
+        transaction["signatures"] = []
+        return transaction
+
+    def sign_many(self, transactions, chain=None, max_workers=None,
+                  chunk_size=50):
+        """Signs multiple transactions with the client's keys.
+
+        Every item is either an operation, a list of operations or a
+        transaction dict. Returns the signed transactions in the same
+        order. If secp256k1 is not installed, signing is spread across
+        a process pool.
+        """
+        reference = None
+        signed_transactions = []
+        digests = []
+        for transaction in transactions:
+            if isinstance(transaction, dict):
+                transaction = OrderedDict(transaction, signatures=[])
+            else:
+                reference = reference or self.reference_block_cache.get()
+                transaction = self.build_transaction(
+                    transaction, reference=reference)
+            signed_transactions.append(transaction)
+            digests.append(self.get_digest(
+                chain, self.get_transaction_hex(transaction)))
+
+        keys = self.client.keys
+        max_workers = max_workers or os.cpu_count() or 1
+        if USE_SECP256K1 or max_workers == 1 or len(digests) <= chunk_size:
+            signatures = [keys.sign(digest) for digest in digests]
+        else:
+            chunks = [digests[i:i + chunk_size]
+                      for i in range(0, len(digests), chunk_size)]
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                signatures = [
+                    chunk_signatures
+                    for results in executor.map(
+                        _sign_digests, [list(keys)] * len(chunks), chunks)
+                    for chunk_signatures in results
+                ]
+
+        for transaction, transaction_signatures in zip(
+                signed_transactions, signatures):
+            transaction["signatures"] = transaction_signatures
+
+        return signed_transactions
 
-        tx_hex = self.client.get_transaction_hex(self.transaction)
-        self.derive_digest(chain, tx_hex)
+    def broadcast(self, operations, chain=None, dry_run=False):
+        # everything is kept in locals, the builder is shared by the
+        # threads using the same client.
+        transaction = self.build_transaction(operations)
+        digest = self.get_digest(
+            chain, self.get_transaction_hex(transaction))
 
-        sigs = []
-        for wif in self.client.keys:
-            p = compat_bytes(PrivateKey(wif))
-            i = 0
-            if USE_SECP256K1:
-                ndata = secp256k1.ffi.new("const int *ndata")
-                ndata[0] = 0
-                while True:
-                    ndata[0] += 1
-                    privkey = secp256k1.PrivateKey(p, raw=True)
-                    sig = secp256k1.ffi.new(
-                        'secp256k1_ecdsa_recoverable_signature *')
-                    signed = secp256k1.lib.secp256k1_ecdsa_sign_recoverable(
-                        privkey.ctx, sig, self.digest, privkey.private_key,
-                        secp256k1.ffi.NULL, ndata)
-                    assert signed == 1
-                    signature, i = privkey.ecdsa_recoverable_serialize(sig)
-                    if self._is_canonical(signature):
-                        i += 4
-                        i += 27
-                        break
-            else:
-                cnt = 0
-                sk = ecdsa.SigningKey.from_string(p, curve=ecdsa.SECP256k1)
-                while 1:
-                    cnt += 1
-                    if not cnt % 20:
-                        print("Still searching for a canonical signature. "
-                              "Tried %d times already!" % cnt)
-
-                    k = ecdsa.rfc6979.generate_k(
-                        sk.curve.generator.order(),
-                        sk.privkey.secret_multiplier,
-                        hashlib.sha256,
-                        hashlib.sha256(
-                            self.digest + struct.pack("d", time.time(
-                            ))
-                        ).digest())
-
-                    sigder = sk.sign_digest(
-                        self.digest, sigencode=ecdsa.util.sigencode_der, k=k)
-
-                    r, s = ecdsa.util.sigdecode_der(sigder,
-                                                    sk.curve.generator.order())
-                    signature = ecdsa.util.sigencode_string(
-                        r, s, sk.curve.generator.order())
-
-                    sigder = array.array('B', sigder)
-                    lenR = sigder[3]
-                    lenS = sigder[5 + lenR]
-                    if lenR is 32 and lenS is 32:
-                        i = self.recover_pubkey_parameter(
-                            self.digest, signature, sk.get_verifying_key())
-                        i += 4
-                        i += 27
-                        break
-
-            sigstr = struct.pack("<B", i)
-            sigstr += signature
-            sigs.append(hexlify(sigstr).decode('ascii'))
-
-        self.transaction["signatures"] = sigs
-        self.client.api_type = preferred_api_type
+        # the keys are parsed once and kept in the client's key ring.
+        transaction["signatures"] = self.client.keys.sign(digest)
 
         if dry_run:
-            return self.transaction
+            return transaction
 
-        return self.client.broadcast_transaction(self.transaction)
+        return self.client.broadcast_transaction(transaction)
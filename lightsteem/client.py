@@ -1,14 +1,22 @@
+import copy
+import json
 import logging
+import time
 import uuid
-from itertools import cycle
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, \
+    ThreadPoolExecutor, wait
 
 import backoff
 import requests
+from requests.adapters import HTTPAdapter
 
 from .exceptions import RPCNodeException
+from .broadcast.key_ring import KeyRing
 from .broadcast.transaction_builder import TransactionBuilder
 from .helpers.account import Account
 from .helpers.rc import ResourceCredit
+from .node_selector import NodeSelector
 
 
 DEFAULT_NODES = [
@@ -16,17 +24,91 @@ DEFAULT_NODES = [
     "https://steemd.minnowsupportproject.org",
 ]
 
+# read-only calls that are safe to send to two nodes at once, or to
+# answer with the response of an identical request.
+HEDGEABLE_METHODS = frozenset([
+    "condenser_api.get_block",
+    "condenser_api.get_block_header",
+    "condenser_api.get_ops_in_block",
+    "condenser_api.get_dynamic_global_properties",
+    "condenser_api.get_accounts",
+    "condenser_api.get_account_history",
+    "condenser_api.get_content",
+    "condenser_api.get_active_votes",
+    "block_api.get_block",
+    "block_api.get_block_header",
+    "database_api.get_dynamic_global_properties",
+    "account_history_api.get_ops_in_block",
+    "account_history_api.get_account_history",
+    "rc_api.find_rc_accounts",
+    "rc_api.get_resource_params",
+    "rc_api.get_resource_pool",
+])
+
+
+class BoundAPI:
+    """A client bound to an api type, like ``client('rc_api')``.
+
+    It only keeps the api type, the transport (sessions, nodes, batch
+    queue etc.) is the client's. It can't be changed, so it's safe to
+    share between the threads.
+    """
+
+    __slots__ = ("client", "api_type")
+
+    def __init__(self, client, api_type):
+        object.__setattr__(self, "client", client)
+        object.__setattr__(self, "api_type", api_type)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError("BoundAPI instances are immutable.")
+
+    def __getattr__(self, attr):
+        if hasattr(type(self.client), attr) or attr in vars(self.client):
+            # client's own methods and attributes. (process_batch,
+            # broadcast, logger, etc.)
+            return getattr(self.client, attr)
+
+        def callable(*args, **kwargs):
+            return self.client.request(
+                attr, *args, api_type=self.api_type, **kwargs)
+
+        return callable
+
+    def __call__(self, api_type):
+        return BoundAPI(self.client, api_type)
+
+    def __repr__(self):
+        return "<BoundAPI: %s>" % self.api_type
+
 
 class Client:
 
     def __init__(self, nodes=None, keys=None, connect_timeout=3,
-                 read_timeout=30, loglevel=logging.ERROR, chain=None):
+                 read_timeout=30, loglevel=logging.ERROR, chain=None,
+                 pool_maxsize=10, pool_idle_timeout=60, failure_threshold=3,
+                 probe_interval=10, hedge=False,
+                 hedged_methods=HEDGEABLE_METHODS, hedge_percentile=90,
+                 hedge_delay=1, response_cache=None, coalesce=True,
+                 coalesced_methods=HEDGEABLE_METHODS):
         self.nodes = nodes
-        self.node_list = cycle(nodes or DEFAULT_NODES)
+        self.node_selector = NodeSelector(
+            nodes or DEFAULT_NODES,
+            probe=self.probe_node,
+            failure_threshold=failure_threshold,
+            probe_interval=probe_interval,
+        )
+        # the default api type. client('..') doesn't change it.
         self.api_type = "condenser_api"
-        self.queue = []
+        # batch queues are per thread.
+        self.local = threading.local()
         self.connect_timeout = connect_timeout
         self.read_timeout = read_timeout
+        self.pool_maxsize = pool_maxsize
+        self.pool_idle_timeout = pool_idle_timeout
+        # node url -> [requests.Session, last used (monotonic)]
+        self.sessions = {}
+        self.session_lock = threading.RLock()
         self.keys = keys or []
         self.chain = chain or "STEEM"
         self.current_node = None
@@ -34,6 +116,22 @@ class Client:
         self.set_logger(loglevel)
         self.next_node()
         self.transaction_builder = TransactionBuilder(self)
+        self.resource_credit = None
+        self.hedge = hedge
+        self.hedged_methods = frozenset(hedged_methods)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.hedge_executor = None
+        self.hedge_stats = {"requests": 0, "fired": 0, "won": 0}
+        self.hedge_lock = threading.Lock()
+        # a ResponseCache instance for the calls on irreversible blocks.
+        self.response_cache = response_cache
+        self.coalesce = coalesce
+        self.coalesced_methods = frozenset(coalesced_methods)
+        # request key -> Future of the response, for the in-flight reads.
+        self.in_flight = {}
+        self.coalesce_stats = {"requests": 0, "coalesced": 0}
+        self.coalesce_lock = threading.Lock()
 
     def __getattr__(self, attr):
         def callable(*args, **kwargs):
@@ -41,12 +139,31 @@ class Client:
 
         return callable
 
+    @property
+    def keys(self):
+        return self._keys
+
+    @keys.setter
+    def keys(self, keys):
+        # keep the parsed keys around between the broadcasts.
+        if not isinstance(keys, KeyRing):
+            keys = KeyRing(keys)
+        self._keys = keys
+
     def __call__(self, *args, **kwargs):
-        # This is not really thread-safe
-        # multi-threaded environments shouldn't share client instances
-        self.api_type = args[0]
+        return BoundAPI(self, args[0])
+
+    @property
+    def queue(self):
+        try:
+            return self.local.queue
+        except AttributeError:
+            self.local.queue = []
+            return self.local.queue
 
-        return self
+    @queue.setter
+    def queue(self, queue):
+        self.local.queue = queue
 
     def set_logger(self, loglevel):
         self.logger = logging.getLogger(__name__)
@@ -58,38 +175,82 @@ class Client:
         self.logger.setLevel(loglevel)
 
     def next_node(self):
-        self.current_node = next(self.node_list)
+        previous_node = self.current_node
+        self.current_node = self.node_selector.best_node(
+            exclude=[previous_node]) or previous_node
+        if previous_node and previous_node != self.current_node:
+            # we only rotate when the node is misbehaving. pooled
+            # connections to it are probably stale, drop them.
+            self.close_session(previous_node)
         self.logger.info("Node set as %s", self.current_node)
 
+    def create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get_session(self, node):
+        now = time.monotonic()
+        with self.session_lock:
+            for url, (session, last_used) in list(self.sessions.items()):
+                if now - last_used > self.pool_idle_timeout:
+                    # evict idle pools, keep-alive connections are
+                    # probably closed by the node at this point.
+                    self.close_session(url)
+
+            if node not in self.sessions:
+                self.sessions[node] = [self.create_session(), now]
+            self.sessions[node][1] = now
+
+            return self.sessions[node][0]
+
+    def close_session(self, node):
+        with self.session_lock:
+            session_info = self.sessions.pop(node, None)
+        if session_info:
+            session_info[0].close()
+
+    def close(self):
+        self.node_selector.close()
+        if self.hedge_executor is not None:
+            self.hedge_executor.shutdown(wait=False)
+            self.hedge_executor = None
+        for node in list(self.sessions):
+            self.close_session(node)
+        if self.response_cache is not None:
+            self.response_cache.close()
+
     def pick_id_for_request(self):
         return str(uuid.uuid4())
 
-    def get_rpc_request_body(self, args, kwargs):
+    def get_rpc_request_body(self, args, kwargs, api_type=None):
+        api_type = api_type or self.api_type
         method_name = args[0]
         if len(args) == 1:
             # condenser_api expects an empty list
             # while other apis expects an empty dict if no arguments
             # sent by the user.
-            params = [] if self.api_type == "condenser_api" else {}
+            params = [] if api_type == "condenser_api" else {}
         else:
-            params = args[1:] if self.api_type == "condenser_api" else args[1]
+            params = args[1:] if api_type == "condenser_api" else args[1]
 
         data = {
             "jsonrpc": "2.0",
-            "method": f"{self.api_type}.{method_name}",
+            "method": f"{api_type}.{method_name}",
             "params": params,
             "id": kwargs.get("id") or self.pick_id_for_request(),
         }
 
         return data
 
-    @backoff.on_exception(backoff.expo,
-                          (requests.exceptions.Timeout,
-                           requests.exceptions.RequestException),
-                          max_tries=5)
-    def _send_request(self, url, request_data, timeout):
+    def _send_request_once(self, url, request_data, timeout):
         self.logger.info("Sending request: %s", request_data)
-        r = requests.post(
+        r = self.get_session(url).post(
             url,
             json=request_data,
             timeout=timeout,
@@ -99,6 +260,277 @@ class Client:
 
         return r.json()
 
+    _send_request = backoff.on_exception(
+        backoff.expo,
+        (requests.exceptions.Timeout,
+         requests.exceptions.RequestException),
+        max_tries=5)(_send_request_once)
+
+    def probe_node(self, node):
+        self._send_request_once(node, {
+            "jsonrpc": "2.0",
+            "method": "condenser_api.get_dynamic_global_properties",
+            "params": [],
+            "id": self.pick_id_for_request(),
+        }, (self.connect_timeout, self.read_timeout))
+
+    def send_with_failover(self, request_data):
+        tried_nodes = []
+        while True:
+            node = self.node_selector.best_node(exclude=tried_nodes)
+            tried_nodes.append(node)
+            is_last_node = len(tried_nodes) >= len(self.node_selector.nodes)
+            if node != self.current_node:
+                self.logger.info("Node set as %s", node)
+                self.current_node = node
+
+            # don't insist on a node if there are others to try. retry
+            # the last one with backoff.
+            send_request = self._send_request if is_last_node \
+                else self._send_request_once
+            started_at = time.monotonic()
+            try:
+                response = send_request(
+                    node,
+                    request_data,
+                    (self.connect_timeout, self.read_timeout),
+                )
+            except requests.exceptions.RequestException as e:
+                self.logger.error(e)
+                self.node_selector.record_failure(node)
+                # the pooled connections are probably stale.
+                self.close_session(node)
+                if is_last_node:
+                    raise e
+
+                self.logger.info("Retrying in another node: %s", request_data)
+                continue
+
+            self.node_selector.record_success(
+                node, time.monotonic() - started_at)
+            return response
+
+    def is_hedgeable(self, request_data):
+        if not self.hedge or len(self.node_selector.nodes) < 2:
+            return False
+        if isinstance(request_data, list):
+            return all(r.get("method") in self.hedged_methods
+                       for r in request_data)
+        return request_data.get("method") in self.hedged_methods
+
+    def get_hedge_delay(self, node):
+        """Seconds to wait for the node before sending the request to
+        another node."""
+        latency = self.node_selector.latency_percentile(
+            node, self.hedge_percentile)
+        return self.hedge_delay if latency is None else latency
+
+    def _timed_send(self, node, request_data):
+        started_at = time.monotonic()
+        try:
+            response = self._send_request_once(
+                node, request_data,
+                (self.connect_timeout, self.read_timeout))
+        except requests.exceptions.RequestException:
+            self.node_selector.record_failure(node)
+            raise
+        self.node_selector.record_success(
+            node, time.monotonic() - started_at)
+        return response
+
+    def send_hedged(self, request_data):
+        """Sends the request to the best node. If it doesn't respond in
+        time, sends it to the second best node too. The first response
+        wins."""
+        with self.hedge_lock:
+            self.hedge_stats["requests"] += 1
+            if self.hedge_executor is None:
+                self.hedge_executor = ThreadPoolExecutor(
+                    max_workers=2 * self.pool_maxsize)
+            executor = self.hedge_executor
+
+        node = self.node_selector.best_node()
+        self.current_node = node
+        primary = executor.submit(self._timed_send, node, request_data)
+        done, _ = wait([primary], timeout=self.get_hedge_delay(node))
+        pending = {primary}
+        hedge = None
+        if not done:
+            hedge_node = self.node_selector.best_node(exclude=[node])
+            self.logger.info(
+                "%s is slow, sending the request to %s too.",
+                node, hedge_node)
+            hedge = executor.submit(self._timed_send, hedge_node,
+                                    request_data)
+            pending.add(hedge)
+            with self.hedge_lock:
+                self.hedge_stats["fired"] += 1
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    self.logger.error(future.exception())
+                    continue
+                # the other request can't be interrupted once it's sent.
+                # it finishes in the background and its response is
+                # dropped. (its latency is still recorded.)
+                for loser in pending:
+                    loser.cancel()
+                if future is hedge:
+                    with self.hedge_lock:
+                        self.hedge_stats["won"] += 1
+                return future.result()
+
+        # both failed, fall back to the usual way.
+        return self.send_with_failover(request_data)
+
+    def get_coalesce_key(self, request_data):
+        """Returns the key that identifies the identical requests. None
+        if the request shouldn't be coalesced."""
+        if not self.coalesce:
+            return None
+        batch = request_data if isinstance(request_data, list) \
+            else [request_data]
+        if not batch or any(r.get("method") not in self.coalesced_methods
+                            for r in batch):
+            return None
+        # a single call and a batch of one call get different responses.
+        return json.dumps([
+            isinstance(request_data, list),
+            [[r["method"], r.get("params")] for r in batch],
+        ], sort_keys=True)
+
+    @property
+    def coalesce_ratio(self):
+        """The ratio of the coalescable requests answered with the
+        response of another request."""
+        if not self.coalesce_stats["requests"]:
+            return 0
+        return self.coalesce_stats["coalesced"] / \
+            self.coalesce_stats["requests"]
+
+    def adapt_response(self, response, sent_request, request_data):
+        """Returns a copy of the response of ``sent_request`` with the
+        ids of ``request_data``."""
+        response = copy.deepcopy(response)
+        if isinstance(sent_request, dict):
+            if isinstance(response, dict):
+                response["id"] = request_data.get("id")
+            return response
+        if not isinstance(response, list):
+            return response
+        ids = {r.get("id"): original.get("id")
+               for r, original in zip(sent_request, request_data)}
+        for r in response:
+            if isinstance(r, dict) and r.get("id") in ids:
+                r["id"] = ids[r["id"]]
+        return response
+
+    def send_coalesced(self, request_data, key):
+        """Sends the request unless an identical one is in flight. In
+        that case, waits for it and returns its response."""
+        with self.coalesce_lock:
+            self.coalesce_stats["requests"] += 1
+            in_flight = self.in_flight.get(key)
+            if in_flight is None:
+                future = Future()
+                self.in_flight[key] = (request_data, future)
+            else:
+                self.coalesce_stats["coalesced"] += 1
+
+        if in_flight is not None:
+            sent_request, response_future = in_flight
+            return self.adapt_response(
+                response_future.result(), sent_request, request_data)
+
+        try:
+            response = self._send_uncoalesced(request_data)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+        finally:
+            with self.coalesce_lock:
+                del self.in_flight[key]
+
+        return response
+
+    def _send_uncoalesced(self, request_data):
+        if self.is_hedgeable(request_data):
+            return self.send_hedged(request_data)
+        return self.send_with_failover(request_data)
+
+    def _send(self, request_data):
+        key = self.get_coalesce_key(request_data)
+        if key is None:
+            return self._send_uncoalesced(request_data)
+        return self.send_coalesced(request_data, key)
+
+    def get_cached_response(self, request_data):
+        key = self.response_cache.get_key(request_data)
+        if key is None:
+            return None
+        result = self.response_cache.get(key)
+        if result is None:
+            return None
+        return {"jsonrpc": "2.0", "result": result,
+                "id": request_data.get("id")}
+
+    def cache_response(self, request_data, response):
+        if not isinstance(response, dict) or "error" in response:
+            return
+        result = response.get("result")
+        self.response_cache.observe(result)
+        self.response_cache.store(request_data, result)
+
+    def send_cached(self, request_data):
+        """Serves the calls on irreversible blocks from the response
+        cache, sends the rest."""
+        if isinstance(request_data, dict):
+            response = self.get_cached_response(request_data)
+            if response is None:
+                response = self._send(request_data)
+                self.cache_response(request_data, response)
+            return response
+
+        # responses in the request order. None for the uncached ones.
+        responses = [self.get_cached_response(r) for r in request_data]
+        uncached_positions = [position for position, response
+                              in enumerate(responses) if response is None]
+        if not uncached_positions:
+            return responses
+
+        uncached_requests = [request_data[position]
+                             for position in uncached_positions]
+        response = self._send(uncached_requests)
+        if not isinstance(response, list):
+            # an error about the batch itself.
+            return response
+
+        # responses are not guaranteed to be in the request order.
+        responses_by_id = {r.get("id"): r for r in response
+                           if isinstance(r, dict)}
+        for index, position in enumerate(uncached_positions):
+            r = request_data[position]
+            fresh_response = responses_by_id.get(r.get("id"))
+            if fresh_response is None and \
+                    len(response) == len(uncached_requests):
+                fresh_response = response[index]
+            if fresh_response is None:
+                fresh_response = {"id": r.get("id"), "error": {
+                    "message": "No response for the request: %s" % r}}
+            responses[position] = fresh_response
+            self.cache_response(r, fresh_response)
+
+        return responses
+
+    def send(self, request_data):
+        if self.response_cache is not None:
+            return self.send_cached(request_data)
+        return self._send(request_data)
+
     def request(self, *args, **kwargs):
         batch_data = kwargs.get("batch_data")
         if batch_data:
@@ -106,31 +538,14 @@ class Client:
             # since it's already formatted for the app base.
             request_data = batch_data
         else:
-            request_data = self.get_rpc_request_body(args, kwargs)
+            request_data = self.get_rpc_request_body(
+                args, kwargs, api_type=kwargs.get("api_type"))
 
         if kwargs.get("batch"):
             self.queue.append(request_data)
             return
 
-        try:
-            response = self._send_request(
-                self.current_node,
-                request_data,
-                (self.connect_timeout, self.read_timeout),
-            )
-        except requests.exceptions.RequestException as e:
-            self.logger.error(e)
-            num_retries = kwargs.get("num_retries", 1)
-
-            if num_retries >= len(self.nodes):
-                raise e
-
-            kwargs.update({"num_retries": num_retries + 1})
-            self.logger.info("Retrying in another node: %s, %s", args, kwargs)
-            self.next_node()
-
-            return self.request(*args, **kwargs)
-
+        response = self.send(request_data)
         self.validate_response(response)
 
         if isinstance(response, dict):
@@ -154,20 +569,84 @@ class Client:
             # one is success? Currently, it raises an RPCNodeException anyway.
             return [self.validate_response(r) for r in response]
 
-    def process_batch(self):
+    def send_batch(self, chunk, raise_on_error=True):
+        """Sends the request bodies in one batch call and returns the
+        results in the same order. Doesn't touch the queue."""
         try:
-            resp = self.request(batch_data=self.queue)
-        finally:
-            # flush the queue in case if any error happens
-            self.queue = []
-        return resp
+            response = self.send(chunk)
+        except requests.exceptions.RequestException as e:
+            if raise_on_error:
+                raise e
+            return [e] * len(chunk)
+
+        if isinstance(response, dict):
+            # the node answered the batch as a whole. (Probably an error
+            # about the batch itself, like the batch size.)
+            try:
+                self.validate_response(response)
+            except RPCNodeException as e:
+                if raise_on_error:
+                    raise e
+                return [e] * len(chunk)
+            return response["result"]
+
+        # responses are not guaranteed to be in the request order.
+        responses_by_id = {r.get("id"): r for r in response}
+        results = []
+        for position, request_data in enumerate(chunk):
+            r = responses_by_id.get(request_data.get("id"))
+            if r is None and len(response) == len(chunk):
+                r = response[position]
+            try:
+                if r is None:
+                    raise RPCNodeException(
+                        "No response for the request: %s" % request_data,
+                        raw_body=response,
+                    )
+                self.validate_response(r)
+            except RPCNodeException as e:
+                if raise_on_error:
+                    raise e
+                results.append(e)
+                continue
+            results.append(r["result"])
+
+        return results
+
+    def process_batch(self, chunk_size=50, max_workers=4,
+                      raise_on_error=True):
+        # flush the queue before sending, so nothing is left behind
+        # in case if any error happens.
+        queue, self.queue = self.queue, []
+        chunks = [queue[i:i + chunk_size]
+                  for i in range(0, len(queue), chunk_size)]
+        if len(chunks) <= 1:
+            return self.send_batch(queue, raise_on_error)
+
+        with ThreadPoolExecutor(
+                max_workers=min(max_workers, len(chunks))) as executor:
+            chunk_results = executor.map(
+                lambda chunk: self.send_batch(
+                    chunk, raise_on_error), chunks)
+            results = []
+            for chunk_result in chunk_results:
+                results += chunk_result
+
+        return results
 
     def broadcast(self, op, dry_run=False):
         return self.transaction_builder.broadcast(
             op, chain=self.chain, dry_run=dry_run)
 
+    def sign_many(self, transactions, max_workers=None):
+        return self.transaction_builder.sign_many(
+            transactions, chain=self.chain, max_workers=max_workers)
+
     def account(self, username):
         return Account(self, username)
 
     def rc(self):
-        return ResourceCredit(self)
+        # shared, so the RC params and pools are cached across the calls.
+        if self.resource_credit is None:
+            self.resource_credit = ResourceCredit(self)
+        return self.resource_credit
@@ -4,8 +4,9 @@ import json
 
 from dateutil.parser import parse
 
-from lightsteem.exceptions import StopOuterIteration
-from lightsteem.datastructures import Operation
+from lightsteem.exceptions import StopOuterIteration, RPCNodeException
+from lightsteem.datastructures import Operation, OPERATION_IDS
+from lightsteem.utils import ordered_prefetch
 
 VOTING_MANA_REGENERATION_IN_SECONDS = 5 * 60 * 60 * 24
 
@@ -16,6 +17,8 @@ class Account:
         self.client = client
         self.username = username
         self.raw_data = None
+        # unknown until the first filtered history call.
+        self.supports_operation_filter = None
 
         if username:
             self._pull_user_data(username)
@@ -32,6 +35,15 @@ class Account:
                              order="desc", filter=None, exclude=None,
                              only_operation_data=True, start_at=None,
                              stop_at=None):
+        history = self.client.get_account_history(account, index, limit)
+        return self._process_account_history(
+            history, order=order, filter=filter, exclude=exclude,
+            only_operation_data=only_operation_data, start_at=start_at,
+            stop_at=stop_at)
+
+    def _process_account_history(self, history, order="desc", filter=None,
+                                 exclude=None, only_operation_data=True,
+                                 start_at=None, stop_at=None):
 
         if not filter:
             filter = []
@@ -40,7 +52,6 @@ class Account:
             exclude = []
         order = -1 if order == "desc" else 1
 
-        history = self.client.get_account_history(account, index, limit)
         for transaction in history[::order]:
 
             created_at = parse(transaction[1]["timestamp"])
@@ -65,19 +76,10 @@ class Account:
 
             yield op_value if only_operation_data else transaction
 
-    def history(self, account=None, limit=1000,
-                filter=None, exclude=None,
-                order="desc", only_operation_data=True,
-                start_at=None, stop_at=None):
-        if not account:
-            account = self.username
-
-        # @todo: this can be faster with batch calls.
-        # consider a way to implement it.
-        max_index = self.client.get_account_history(account, -1, 0)[0][0]
-        if not max_index:
-            return
-
+    def _history_windows(self, max_index, limit, order="desc"):
+        """Yields (index, limit) pairs of the get_account_history calls
+        required to traverse the history.
+        """
         if order == "desc":
             # Reverse history:
             # Loop until we process all ops
@@ -88,36 +90,100 @@ class Account:
                 if last_processed_index - limit < 0:
                     limit = last_processed_index
 
-                try:
-                    for account_history in self._get_account_history(
-                            account, index=last_processed_index,
-                            limit=limit, filter=filter, exclude=exclude,
-                            order=order,
-                            only_operation_data=only_operation_data,
-                            start_at=start_at, stop_at=stop_at):
-                        yield account_history
-                except StopOuterIteration as e:
-                    # make sure the while loop is terminated
-                    break
+                yield last_processed_index, limit
 
                 # increment limit by one to prevent double hits.
                 last_processed_index -= limit + 1
         else:
             last_processed_index = limit
             while last_processed_index < max_index + limit:
-                try:
-                    for account_history in self._get_account_history(
-                            account, index=last_processed_index,
-                            limit=limit, filter=filter, exclude=exclude,
-                            order=order,
-                            only_operation_data=only_operation_data,
-                            start_at=start_at, stop_at=stop_at):
-                        yield account_history
-                except StopOuterIteration as e:
-                    # make sure the while loop is terminated
-                    break
+                yield last_processed_index, limit
                 last_processed_index += limit + 1
 
+    def _get_operation_filter(self, operation_types):
+        """Returns the (operation_filter_low, operation_filter_high)
+        bitmasks of the operation types for get_account_history. Returns
+        None if there is nothing to filter or an operation type is unknown.
+        """
+        if not operation_types:
+            return None
+
+        operation_filter = 0
+        for operation_type in operation_types:
+            if operation_type not in OPERATION_IDS:
+                return None
+            operation_filter |= 1 << OPERATION_IDS[operation_type]
+
+        return (operation_filter & 0xFFFFFFFFFFFFFFFF,
+                operation_filter >> 64)
+
+    def _filtered_history_pages(self, account, page, limit,
+                                operation_filter):
+        """Yields the pages of a filtered (reverse) account history.
+
+        A filtered page has up to ``limit`` matching operations, we can't
+        know the index of the next page before getting the current one.
+        """
+        while page:
+            yield page
+            page_limit = min(limit, page[0][0] - 1)
+            if len(page) < limit or page_limit <= 0:
+                break
+
+            page = self.client.get_account_history(
+                account, page[0][0] - 1, page_limit, *operation_filter)
+
+    def history(self, account=None, limit=1000,
+                filter=None, exclude=None,
+                order="desc", only_operation_data=True,
+                start_at=None, stop_at=None, max_workers=4, read_ahead=4):
+        if not account:
+            account = self.username
+
+        max_index = self.client.get_account_history(account, -1, 0)[0][0]
+        if not max_index:
+            return
+
+        first_page = None
+        operation_filter = self._get_operation_filter(filter)
+        if operation_filter and order == "desc" and \
+                self.supports_operation_filter is not False:
+            # let the node drop the operations we don't need.
+            try:
+                first_page = self.client.get_account_history(
+                    account, max_index, min(limit, max_index),
+                    *operation_filter)
+                self.supports_operation_filter = True
+            except RPCNodeException:
+                # older nodes don't know about the filter params.
+                self.supports_operation_filter = False
+
+        if first_page is not None:
+            pages = self._filtered_history_pages(
+                account, first_page, limit, operation_filter)
+        else:
+            # the windows are known in advance, so the next pages are
+            # fetched in parallel while the current one is consumed.
+            pages = ordered_prefetch(
+                lambda window: self.client.get_account_history(
+                    account, *window),
+                self._history_windows(max_index, limit, order=order),
+                max_workers=max_workers,
+                window=read_ahead,
+            )
+        try:
+            for history in pages:
+                yield from self._process_account_history(
+                    history, filter=filter, exclude=exclude,
+                    order=order,
+                    only_operation_data=only_operation_data,
+                    start_at=start_at, stop_at=stop_at)
+        except StopOuterIteration:
+            # make sure the remaining pages are not fetched
+            pass
+        finally:
+            pages.close()
+
     def _get_relationships(self, account, start_from="", type="blog",
                            limit=1000, method="get_followers"):
 
@@ -221,41 +287,36 @@ class Account:
         return round(percent, precision)
 
     def get_resource_credit_info(self):
-        preffered_api_type = self.client.api_type
-        try:
-            rc_info = self.client('rc_api').find_rc_accounts(
-                {"accounts": [self.username]}).get(
-                "rc_accounts", [])
-            rc_info = rc_info[0]
-
-            last_mana = int(rc_info["rc_manabar"]["current_mana"])
-            max_mana = int(rc_info["max_rc"])
-            updated_at = datetime.datetime.utcfromtimestamp(
-                rc_info["rc_manabar"]["last_update_time"])
-            diff_in_seconds = (
-                    datetime.datetime.utcnow() - updated_at).total_seconds()
-            regenerated_mana = (diff_in_seconds * max_mana
-                                / VOTING_MANA_REGENERATION_IN_SECONDS)
-            current_mana = last_mana + regenerated_mana
-
-            last_mana_percent = last_mana * 100 / max_mana
-            current_mana_percent = current_mana * 100 / max_mana
-
-            # regeneration estimation until %100?
-            total_mana_required = 100 - current_mana_percent
-            recharge_in_seconds = total_mana_required * \
-                VOTING_MANA_REGENERATION_IN_SECONDS / 100
-            return {
-                "last_mana": last_mana,
-                "last_mana_percent": last_mana_percent,
-                "current_mana": current_mana,
-                "current_mana_percent": current_mana_percent,
-                "max_mana": max_mana,
-                "full_recharge_in_seconds": recharge_in_seconds,
-            }
-
-        finally:
-            self.client.api_type = preffered_api_type
+        rc_info = self.client('rc_api').find_rc_accounts(
+            {"accounts": [self.username]}).get(
+            "rc_accounts", [])
+        rc_info = rc_info[0]
+
+        last_mana = int(rc_info["rc_manabar"]["current_mana"])
+        max_mana = int(rc_info["max_rc"])
+        updated_at = datetime.datetime.utcfromtimestamp(
+            rc_info["rc_manabar"]["last_update_time"])
+        diff_in_seconds = (
+                datetime.datetime.utcnow() - updated_at).total_seconds()
+        regenerated_mana = (diff_in_seconds * max_mana
+                            / VOTING_MANA_REGENERATION_IN_SECONDS)
+        current_mana = last_mana + regenerated_mana
+
+        last_mana_percent = last_mana * 100 / max_mana
+        current_mana_percent = current_mana * 100 / max_mana
+
+        # regeneration estimation until %100?
+        total_mana_required = 100 - current_mana_percent
+        recharge_in_seconds = total_mana_required * \
+            VOTING_MANA_REGENERATION_IN_SECONDS / 100
+        return {
+            "last_mana": last_mana,
+            "last_mana_percent": last_mana_percent,
+            "current_mana": current_mana,
+            "current_mana_percent": current_mana_percent,
+            "max_mana": max_mana,
+            "full_recharge_in_seconds": recharge_in_seconds,
+        }
 
     def reputation(self, precision=2):
         rep = int(self.raw_data['reputation'])
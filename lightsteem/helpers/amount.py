@@ -1,8 +1,14 @@
-
 from decimal import Decimal
 
 
 class Amount:
+    """An amount of an asset, like "1.942 SBD".
+
+    Stored as an integer (in the smallest unit of the amount's precision)
+    and a symbol, so the arithmetic is exact.
+    """
+
+    __slots__ = ("satoshis", "precision", "symbol")
 
     ASSETS = {
         "SBD": {"precision": 3, "nai": "@@000000013"},
@@ -10,31 +16,150 @@ class Amount:
         "VESTS": {"precision": 6, "nai": "@@000000037"},
     }
 
+    NAI_SYMBOLS = {
+        asset_detail["nai"]: symbol
+        for symbol, asset_detail in ASSETS.items()
+    }
+
+    # symbol -> (shared symbol string, precision)
+    SYMBOL_PRECISIONS = {
+        symbol: (symbol, asset_detail["precision"])
+        for symbol, asset_detail in ASSETS.items()
+    }
+
     @classmethod
     def from_asset(cls, asset_dict):
-        amount = int(asset_dict["amount"]) / pow(10, asset_dict["precision"])
-        asset = cls.get_symbol_from_nai(asset_dict["nai"])
-        return Amount(f"{amount} {asset}")
+        return cls._create(
+            int(asset_dict["amount"]),
+            int(asset_dict["precision"]),
+            cls.get_symbol_from_nai(asset_dict["nai"]))
+
+    @classmethod
+    def _create(cls, satoshis, precision, symbol):
+        amount = cls.__new__(cls)
+        amount.satoshis = satoshis
+        amount.precision = precision
+        amount.symbol = symbol
+        return amount
 
     @staticmethod
     def get_symbol_from_nai(nai):
-        for symbol, asset_detail in Amount.ASSETS.items():
-            if nai == asset_detail["nai"]:
-                return symbol
+        return Amount.NAI_SYMBOLS.get(nai)
 
     def __init__(self, amount_data):
-        amount, self.symbol = amount_data.split()
-        self.amount = Decimal(amount)
-        self.raw_data = amount_data
+        if isinstance(amount_data, dict):
+            amount = self.from_asset(amount_data)
+            self.satoshis = amount.satoshis
+            self.precision = amount.precision
+            self.symbol = amount.symbol
+            return
+
+        amount, symbol = amount_data.split()
+        integer, _, fraction = amount.partition(".")
+        try:
+            satoshis = int(integer + fraction)
+        except ValueError:
+            # exponents etc.
+            exponent = Decimal(amount).as_tuple().exponent
+            fraction = "0" * max(-exponent, 0)
+            satoshis = int(Decimal(amount).scaleb(len(fraction)))
+
+        known_asset = self.SYMBOL_PRECISIONS.get(symbol)
+        if known_asset is None:
+            # unknown asset, keep the precision as is.
+            precision = len(fraction)
+        else:
+            symbol, precision = known_asset
+            if len(fraction) < precision:
+                satoshis *= 10 ** (precision - len(fraction))
+            else:
+                precision = len(fraction)
+
+        self.satoshis = satoshis
+        self.precision = precision
+        self.symbol = symbol
+
+    @property
+    def amount(self):
+        return Decimal(self.satoshis).scaleb(-self.precision)
+
+    @property
+    def raw_data(self):
+        return str(self)
 
     def _check_type(self, other):
         if not isinstance(other, Amount):
             raise TypeError(
                 "This operation only works with two Amount instances.")
+        if other.symbol != self.symbol:
+            raise TypeError(
+                "This operation only works with the same assets. "
+                f"({self.symbol}, {other.symbol})")
+
+    def _align(self, other):
+        """Returns the satoshis of both amounts in the same precision."""
+        self._check_type(other)
+        if self.precision == other.precision:
+            return self.satoshis, other.satoshis, self.precision
+        if self.precision > other.precision:
+            return self.satoshis, other.satoshis * 10 ** (
+                self.precision - other.precision), self.precision
+        return self.satoshis * 10 ** (
+            other.precision - self.precision), other.satoshis, \
+            other.precision
+
+    def __add__(self, other):
+        satoshis, other_satoshis, precision = self._align(other)
+        return self._create(satoshis + other_satoshis, precision,
+                            self.symbol)
+
+    def __radd__(self, other):
+        # sum() starts with 0
+        if other == 0:
+            return self
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        satoshis, other_satoshis, precision = self._align(other)
+        return self._create(satoshis - other_satoshis, precision,
+                            self.symbol)
+
+    def __neg__(self):
+        return self._create(-self.satoshis, self.precision, self.symbol)
+
+    def __eq__(self, other):
+        if not isinstance(other, Amount):
+            return NotImplemented
+        if other.symbol != self.symbol:
+            return False
+        satoshis, other_satoshis, _ = self._align(other)
+        return satoshis == other_satoshis
+
+    def __lt__(self, other):
+        satoshis, other_satoshis, _ = self._align(other)
+        return satoshis < other_satoshis
+
+    def __le__(self, other):
+        satoshis, other_satoshis, _ = self._align(other)
+        return satoshis <= other_satoshis
+
+    def __gt__(self, other):
+        satoshis, other_satoshis, _ = self._align(other)
+        return satoshis > other_satoshis
+
+    def __ge__(self, other):
+        satoshis, other_satoshis, _ = self._align(other)
+        return satoshis >= other_satoshis
+
+    def __hash__(self):
+        return hash((self.amount, self.symbol))
 
     def __str__(self):
         return f"{self.amount} {self.symbol}"
 
+    def __repr__(self):
+        return f"<Amount: {self}>"
+
     def __int__(self):
         raise ValueError("It's not possible to cast Amount instances to int.")
 
@@ -43,9 +168,16 @@ class Amount:
 
     @property
     def asset(self):
-        precision = self.ASSETS.get(self.symbol).get("precision")
+        asset_precision = self.ASSETS.get(self.symbol).get("precision")
+        satoshis = self.satoshis
+        if self.precision > asset_precision:
+            # truncate the extra digits, like int() does.
+            factor = 10 ** (self.precision - asset_precision)
+            satoshis = abs(satoshis) // factor * (-1 if satoshis < 0 else 1)
+        elif self.precision < asset_precision:
+            satoshis *= 10 ** (asset_precision - self.precision)
         return {
-            "amount": str(int(self.amount * pow(10, precision))),
-            "precision": precision,
+            "amount": str(satoshis),
+            "precision": asset_precision,
             "nai": self.ASSETS.get(self.symbol).get("nai")
         }
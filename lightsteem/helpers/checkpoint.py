@@ -0,0 +1,112 @@
+import json
+import os
+import sqlite3
+import time
+
+
+class CheckpointStore:
+    """Keeps the position of the last fully processed operation of a
+    TransactionListener stream.
+
+    Checkpoints are kept in memory and written to the storage in every
+    ``flush_every`` updates or ``flush_interval`` seconds, whichever comes
+    first. If the process is killed, the stream is resumed from the last
+    flushed checkpoint, so a handful of operations may be processed again.
+
+    Subclasses implement ``read`` and ``write``.
+    """
+
+    def __init__(self, flush_every=100, flush_interval=5):
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.checkpoint = None
+        self.pending_updates = 0
+        self.last_flush = time.monotonic()
+
+    def load(self):
+        """Returns the last checkpoint as a (block_num, op_index) tuple.
+        op_index is None if the whole block is processed.
+        """
+        if self.checkpoint is None:
+            self.checkpoint = self.read()
+        return self.checkpoint
+
+    def save(self, block_num, op_index=None):
+        self.checkpoint = (block_num, op_index)
+        self.pending_updates += 1
+        if self.pending_updates >= self.flush_every or \
+                time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.pending_updates:
+            self.write(*self.checkpoint)
+            self.pending_updates = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+
+    def read(self):
+        raise NotImplementedError
+
+    def write(self, block_num, op_index):
+        raise NotImplementedError
+
+
+class FileCheckpointStore(CheckpointStore):
+    """Keeps the checkpoint in a JSON file. The file is replaced
+    atomically, so a crash while writing doesn't corrupt it.
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        return checkpoint["block_num"], checkpoint["op_index"]
+
+    def write(self, block_num, op_index):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"block_num": block_num, "op_index": op_index}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """Keeps the checkpoints in a SQLite database. A database can hold
+    the checkpoints of several streams, each stream has its own name.
+    """
+
+    def __init__(self, path, name="default", **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "name TEXT PRIMARY KEY, block_num INTEGER, op_index INTEGER)")
+        self.connection.commit()
+
+    def read(self):
+        row = self.connection.execute(
+            "SELECT block_num, op_index FROM checkpoints WHERE name = ?",
+            (self.name, )).fetchone()
+        return tuple(row) if row else None
+
+    def write(self, block_num, op_index):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(name, block_num, op_index) VALUES (?, ?, ?)",
+                (self.name, block_num, op_index))
+
+    def close(self):
+        super().close()
+        self.connection.close()
@@ -1,16 +1,39 @@
 import time
 
+from lightsteem.utils import ordered_prefetch
+from lightsteem.vendor.rc import STEEM_BLOCK_INTERVAL
+
 
 class TransactionListener:
 
     def __init__(self, client, blockchain_mode=None,
                  start_block=None, end_block=None,
-                 only_ops=True):
+                 only_ops=True, catch_up_threshold=100,
+                 catch_up_batch_size=50, catch_up_workers=4,
+                 catch_up_prefetch=8, min_poll_interval=0.5,
+                 checkpoint=None):
         self.client = client
         self.blockchain_mode = blockchain_mode or "irreversible"
         self.start_block = start_block
         self.end_block = end_block
         self.only_ops = only_ops
+        # if we're behind more than catch_up_threshold blocks, blocks are
+        # fetched with batch calls in parallel until we reach the head.
+        self.catch_up_threshold = catch_up_threshold
+        self.catch_up_batch_size = catch_up_batch_size
+        self.catch_up_workers = catch_up_workers
+        self.catch_up_prefetch = catch_up_prefetch
+        self.min_poll_interval = min_poll_interval
+        # a CheckpointStore to resume the stream where it's left.
+        self.checkpoint = checkpoint
+        self.last_block_height = None
+        self.height_changed_at = None
+        self.stats = {
+            "height_refreshes": 0,
+            # get_dynamic_global_properties calls we didn't need to make
+            # thanks to the known last block height.
+            "saved_height_refreshes": 0,
+        }
 
     def get_last_block_height(self):
         props = self.client.get_dynamic_global_properties()
@@ -31,24 +54,140 @@ class TransactionListener:
         block_data = self.client.get_block(block_num)
         return block_data
 
+    def get_block_batch(self, block_nums, ops=True):
+        self.client.logger.info(
+            "Getting blocks: %s-%s", block_nums[0], block_nums[-1])
+        if ops:
+            calls = [("get_ops_in_block", n, False) for n in block_nums]
+        else:
+            calls = [("get_block", n) for n in block_nums]
+        batch_data = [
+            self.client.get_rpc_request_body(call, {}) for call in calls]
+        return block_nums, self.client.send_batch(batch_data)
+
+    def get_block_range(self, start_block, end_block, ops=True):
+        """Yields (block_num, ops or block) tuples for the blocks
+        in [start_block, end_block) in the block order. Blocks are fetched
+        with batch calls by a pool of workers, with a bounded read-ahead.
+        """
+        batch_size = self.catch_up_batch_size
+        batches = (
+            range(n, min(n + batch_size, end_block))
+            for n in range(start_block, end_block, batch_size)
+        )
+        for block_nums, results in ordered_prefetch(
+                lambda block_nums: self.get_block_batch(block_nums, ops),
+                batches,
+                max_workers=self.catch_up_workers,
+                window=self.catch_up_prefetch):
+            for block_num, result in zip(block_nums, results):
+                yield block_num, result
+
+    def refresh_last_block_height(self):
+        last_block_height = self.get_last_block_height()
+        self.stats["height_refreshes"] += 1
+        if self.last_block_height is None or \
+                last_block_height > self.last_block_height:
+            self.height_changed_at = time.monotonic()
+        self.last_block_height = last_block_height
+
+        return last_block_height
+
+    def wait_for_next_block(self):
+        # a new block is expected STEEM_BLOCK_INTERVAL seconds after we saw
+        # the last one. if it's late, poll again in min_poll_interval.
+        delay = STEEM_BLOCK_INTERVAL
+        if self.height_changed_at is not None:
+            delay = (self.height_changed_at + STEEM_BLOCK_INTERVAL
+                     - time.monotonic())
+        time.sleep(max(delay, self.min_poll_interval))
+
+    def save_checkpoint(self, block_num, op_index=None):
+        if self.checkpoint:
+            self.checkpoint.save(block_num, op_index)
+
+    def emit_block(self, block_num, result, ops=True, skip_until=None):
+        # the checkpoint is saved when the consumer asks for the next item,
+        # that's when we know the previous one is fully processed.
+        if ops:
+            for op_index, op in enumerate(result):
+                if skip_until is not None and op_index <= skip_until:
+                    continue
+                yield op
+                self.save_checkpoint(block_num, op_index)
+        else:
+            yield result
+        self.save_checkpoint(block_num)
+
     def listen(self, ops=True):
         current_block = self.start_block
+        resume_block, skip_until = None, None
+        if self.checkpoint and self.checkpoint.load():
+            resume_block, skip_until = self.checkpoint.load()
+            current_block = resume_block
+            if skip_until is None:
+                # the whole block is processed
+                current_block += 1
+        # the height we already know for the first iteration.
+        known_block_height = None
         if not current_block:
-            current_block = self.get_last_block_height()
-        while True:
-            while (self.get_last_block_height() - current_block) > 0:
+            current_block = known_block_height = \
+                self.refresh_last_block_height()
+        try:
+            while True:
+                last_block_height = known_block_height or \
+                    self.refresh_last_block_height()
+                known_block_height = None
+                if self.catch_up_threshold and \
+                        last_block_height - current_block > \
+                        self.catch_up_threshold:
+                    end_block = last_block_height
+                    if self.end_block:
+                        end_block = min(end_block, self.end_block + 1)
+                    for block_num, result in self.get_block_range(
+                            current_block, end_block, ops=ops):
+                        yield from self.emit_block(
+                            block_num, result, ops=ops,
+                            skip_until=skip_until
+                            if block_num == resume_block else None)
+                    self.stats["saved_height_refreshes"] += \
+                        end_block - current_block - 1
+                    current_block = end_block
+                    if self.end_block and current_block > self.end_block:
+                        return
+                    # check the head again, there might be new blocks
+                    # while we're catching up.
+                    continue
+
+                if current_block >= last_block_height:
+                    if self.end_block and current_block > self.end_block:
+                        return
+                    self.wait_for_next_block()
+                    continue
+
+                # we know the blocks until the last_block_height are there,
+                # no need to ask for the height again until we reach it.
+                while current_block < last_block_height:
+                    if self.end_block and current_block > self.end_block:
+                        return
+                    if ops:
+                        block_num, result = self.get_ops(current_block)
+                    else:
+                        result = self.get_block(current_block)
+                    yield from self.emit_block(
+                        current_block, result, ops=ops,
+                        skip_until=skip_until
+                        if current_block == resume_block else None)
+
+                    current_block += 1
+                    if current_block < last_block_height:
+                        self.stats["saved_height_refreshes"] += 1
+
                 if self.end_block and current_block > self.end_block:
                     return
-                if ops:
-                    block_num, ops = self.get_ops(current_block)
-                    for op in ops:
-                        yield op
-                else:
-                    yield self.get_block(current_block)
-
-                current_block += 1
-
-            time.sleep(3)
+        finally:
+            if self.checkpoint:
+                self.checkpoint.flush()
 
     def listen_blocks(self):
         return self.listen(ops=False)
@@ -57,13 +196,16 @@ class TransactionListener:
 class EventListener:
 
     def __init__(self, client, blockchain_mode=None,
-                 start_block=None, end_block=None):
+                 start_block=None, end_block=None, catch_up_threshold=100,
+                 checkpoint=None):
         self.client = client
         self.transaction_listener = TransactionListener(
             self.client,
             blockchain_mode=blockchain_mode,
             start_block=start_block,
             end_block=end_block,
+            catch_up_threshold=catch_up_threshold,
+            checkpoint=checkpoint,
         )
 
     def on(self, op_type, filter_by=None, condition=None):
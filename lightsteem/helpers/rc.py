@@ -1,47 +1,219 @@
+import datetime
+import threading
+import time
+
 from lightsteem.vendor.rc import (
-    RCModel, STEEM_RC_REGEN_TIME, STEEM_BLOCK_INTERVAL
+    RCModel, ResourceCount, STEEM_RC_REGEN_TIME, STEEM_BLOCK_INTERVAL
 )
 
 from lightsteem.helpers.amount import Amount
+from lightsteem.broadcast.serializer import varint
+
+# used to build the transactions that are only sized, never broadcasted.
+# the reference block doesn't change the size, no need to fetch it.
+SIZING_REFERENCE_BLOCK = {
+    "ref_block_num": 0,
+    "ref_block_prefix": 0,
+    "head_block_time": datetime.datetime(2018, 1, 1),
+}
+
+
+class RCContext:
+    """Keeps the data RC cost calculations need.
+
+    Resource params rarely change, they're cached until invalidated.
+    Resource pools and the RC regeneration rate change every block, so
+    they're cached for ``pool_ttl`` seconds (a block interval by default).
+    """
+
+    def __init__(self, client, pool_ttl=STEEM_BLOCK_INTERVAL):
+        self.client = client
+        self.pool_ttl = pool_ttl
+        self.model = None
+        self.pool_fetched_at = None
+        self.lock = threading.Lock()
+
+    def fetch(self, include_params):
+        calls = [("condenser_api", "get_dynamic_global_properties")]
+        if include_params:
+            calls.append(("rc_api", "get_resource_params"))
+        calls.append(("rc_api", "get_resource_pool"))
+
+        # sent on its own, the calls the user queued stay in the queue.
+        results = self.client.send_batch([
+            self.client.get_rpc_request_body(
+                (method, ), {}, api_type=api_type)
+            for api_type, method in calls])
+
+        chain_props, resource_pool = results[0], results[-1]
+        total_vesting_shares = int(
+            Amount(chain_props["total_vesting_shares"]).amount)
+        rc_regen = total_vesting_shares // (
+                STEEM_RC_REGEN_TIME // STEEM_BLOCK_INTERVAL)
+        resource_params = results[1] if include_params else None
+        return resource_params, resource_pool["resource_pool"], rc_regen
+
+    def get_model(self):
+        with self.lock:
+            pool_age = time.monotonic() - self.pool_fetched_at \
+                if self.pool_fetched_at is not None else None
+            if self.model is not None and pool_age is not None and \
+                    pool_age <= self.pool_ttl:
+                return self.model
+
+            resource_params, resource_pool, rc_regen = self.fetch(
+                include_params=self.model is None)
+            if self.model is None:
+                self.model = RCModel(resource_params=resource_params,
+                                     resource_pool=resource_pool,
+                                     rc_regen=rc_regen)
+            else:
+                self.model.resource_pool = resource_pool
+                self.model.rc_regen = rc_regen
+            self.pool_fetched_at = time.monotonic()
+            return self.model
+
+    def invalidate_pool(self):
+        """Refreshes the resource pools on the next calculation."""
+        with self.lock:
+            self.pool_fetched_at = None
+
+    def invalidate(self):
+        """Refreshes everything, including the resource params, on the
+        next calculation."""
+        with self.lock:
+            self.model = None
+            self.pool_fetched_at = None
 
 
 class ResourceCredit:
 
-    def __init__(self, client):
+    def __init__(self, client, pool_ttl=STEEM_BLOCK_INTERVAL):
         self.client = client
+        self.context = RCContext(client, pool_ttl=pool_ttl)
+
+    def invalidate(self):
+        self.context.invalidate()
+
+    def get_transaction_size(self, transaction, signature_count=1):
+        """Returns the size of the transaction after it's signed, without
+        signing it."""
+        unsigned_size = len(bytes.fromhex(
+            self.client.transaction_builder.get_transaction_hex(
+                transaction)))
+        # an empty signature list is a single zero byte. a signature is
+        # 65 bytes.
+        return unsigned_size - 1 + len(varint(signature_count)) + \
+            65 * signature_count
+
+    def get_costs(self, operations):
+        """Returns the RC cost breakdowns of the operations.
+
+        Every item is an operation or a list of operations (a
+        transaction). All of them are calculated with the same RC
+        snapshot and sized locally, nothing is signed.
+        """
+        transaction_builder = self.client.transaction_builder
+        signature_count = max(len(self.client.keys), 1)
+        model = self.context.get_model()
+        reference = dict(SIZING_REFERENCE_BLOCK, fetched_at=time.monotonic())
+
+        costs = []
+        for operation in operations:
+            transaction = transaction_builder.build_transaction(
+                operation, reference=reference)
+            tx_size = self.get_transaction_size(
+                transaction, signature_count=signature_count)
+            tx_cost = model.get_transaction_rc_cost(transaction, tx_size)
+            tx_cost["size"] = tx_size
+            tx_cost["total_cost"] = sum(tx_cost["cost"].values())
+            costs.append(tx_cost)
+
+        return costs
 
     def get_cost(self, operation):
-        preffered_api_type = self.client.api_type
-        keys = self.client.keys
-        if not len(keys):
-            # add a dummy key
-            self.client.keys = [
-                "5KQwrPbwdL6PhXujxW37FSSQZ1JiwsST4cqQzDeyXtP79zkvFD3"]
-        try:
-            tx = self.client.broadcast(operation, dry_run=True)
-            signed_tx_hex = self.client.get_transaction_hex(tx)
-            tx_size = len(bytes.fromhex(signed_tx_hex))
-
-            self.client('condenser_api').get_dynamic_global_properties(
-                batch=True)
-            self.client('rc_api').get_resource_params(batch=True)
-            self.client('rc_api').get_resource_pool(batch=True)
-
-            chain_props, resource_params, resource_pool = self.client.\
-                process_batch()
-
-            resource_pool = resource_pool["resource_pool"]
-
-            total_vesting_shares = int(
-                Amount(chain_props["total_vesting_shares"]).amount)
-            rc_regen = total_vesting_shares // (
-                    STEEM_RC_REGEN_TIME // STEEM_BLOCK_INTERVAL)
-            model = RCModel(resource_params=resource_params,
-                            resource_pool=resource_pool, rc_regen=rc_regen)
-
-            tx_cost = model.get_transaction_rc_cost(tx, tx_size)
-            total_cost = sum(tx_cost["cost"].values())
-            return total_cost
-        finally:
-            self.client.api_type = preffered_api_type
-            self.client.keys = keys
+        return self.get_costs([operation])[0]["total_cost"]
+
+
+class RCPoolSimulator:
+    """Simulates the resource pools block by block.
+
+    Does the same math as ``RCModel.apply_rc_pool_dynamics`` and
+    ``compute_rc_cost_of_resource``, with the params of every resource
+    converted to integers once.
+    """
+
+    def __init__(self, resource_params, resource_pool, rc_regen):
+        self.resource_names = tuple(resource_params["resource_names"])
+        self.rc_regen = rc_regen
+        self.pools = [int(resource_pool[resource_name]["pool"])
+                      for resource_name in self.resource_names]
+        self.block_count = 0
+
+        # (resource unit, budget, decay per time unit, decay shift,
+        #  price numerator, coeff_b) for every resource.
+        self.constants = []
+        for resource_name in self.resource_names:
+            params = resource_params["resource_params"][resource_name]
+            dynamics = params["resource_dynamics_params"]
+            curve = params["price_curve_params"]
+            self.constants.append((
+                int(dynamics["resource_unit"]),
+                int(dynamics["budget_per_time_unit"]),
+                int(dynamics["decay_params"]["decay_per_time_unit"]),
+                int(dynamics["decay_params"][
+                    "decay_per_time_unit_denom_shift"]),
+                ((rc_regen * int(curve["coeff_a"])) >> int(curve["shift"]))
+                + 1,
+                int(curve["coeff_b"]),
+            ))
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(model.resource_params, model.resource_pool,
+                   model.rc_regen)
+
+    def _get_counts(self, count):
+        if isinstance(count, ResourceCount):
+            return [getattr(count, resource_name)
+                    for resource_name in self.resource_names]
+        if isinstance(count, dict):
+            return [count.get(resource_name, 0)
+                    for resource_name in self.resource_names]
+        return count
+
+    def prices(self):
+        """Returns the RC cost of a resource unit for every resource,
+        at the current pools."""
+        return [
+            (numerator * unit) // (coeff_b + max(pool, 0)) + 1
+            for pool, (unit, _, _, _, numerator, coeff_b) in zip(
+                self.pools, self.constants)
+        ]
+
+    def step(self, count):
+        """Applies a block's resource counts (a ResourceCount, a dict or
+        a list in ``resource_names`` order) to the pools."""
+        new_pools = []
+        for pool, resource_count, (unit, budget, decay_per_time_unit,
+                                   decay_shift, _, _) in zip(
+                self.pools, self._get_counts(count), self.constants):
+            usage = resource_count * unit
+            remaining = pool - usage
+            # rd_compute_pool_decay, with dt = 1
+            if remaining < 0:
+                decay = -min((decay_per_time_unit * -remaining)
+                             >> decay_shift, -remaining)
+            else:
+                decay = min((decay_per_time_unit * remaining)
+                            >> decay_shift, remaining)
+            new_pools.append(remaining - decay + budget)
+        self.pools = new_pools
+        self.block_count += 1
+        return new_pools
+
+    def simulate(self, block_counts):
+        """Yields the (pools, prices) after every block's resource
+        counts are applied."""
+        for count in block_counts:
+            yield self.step(count), self.prices()
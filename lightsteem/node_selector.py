@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import deque
+
+
+class NodeStats:
+    """Rolling latency and error statistics of a node."""
+
+    def __init__(self, node, window=20, latency_samples=200):
+        self.node = node
+        self.latencies = deque(maxlen=window)
+        # a longer history for the percentiles.
+        self.latency_samples = deque(maxlen=latency_samples)
+        # True for the failed requests, False for the successful ones.
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.circuit_opened_at = None
+
+    @property
+    def latency(self):
+        """Average latency of the recent successful requests. None if
+        there is none."""
+        if not self.latencies:
+            return None
+        return sum(self.latencies) / len(self.latencies)
+
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    @property
+    def is_available(self):
+        return self.circuit_opened_at is None
+
+    def score(self):
+        """Lower is better. Nodes without any requests score 0, so
+        every node is tried at least once."""
+        latency = self.latency
+        if latency is None:
+            # never succeeded.
+            return float("inf") if self.outcomes else 0
+        return latency * (1 + 4 * self.error_rate)
+
+    def as_dict(self):
+        return {
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "consecutive_failures": self.consecutive_failures,
+            "available": self.is_available,
+        }
+
+
+class NodeSelector:
+    """Picks the best node for the next request.
+
+    Nodes are scored by their recent latency and error rate. After
+    ``failure_threshold`` consecutive failures, the circuit of the node is
+    opened and it doesn't receive any traffic until a background probe
+    (``probe(node)``, every ``probe_interval`` seconds) succeeds.
+    """
+
+    def __init__(self, nodes, probe=None, window=20, failure_threshold=3,
+                 probe_interval=10):
+        self.nodes = list(nodes)
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.stats = {node: NodeStats(node, window=window)
+                      for node in self.nodes}
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.probes = {}
+
+    def best_node(self, exclude=()):
+        """Returns the best available node that is not excluded. If all
+        of them are unavailable, returns the one that failed first.
+        Returns None if all nodes are excluded."""
+        with self.lock:
+            candidates = [self.stats[node] for node in self.nodes
+                          if node not in exclude]
+            if not candidates:
+                return None
+            available = [stats for stats in candidates if stats.is_available]
+            if not available:
+                return min(candidates,
+                           key=lambda stats: stats.circuit_opened_at).node
+            # min() keeps the first one of the equal scores, so the
+            # order of the nodes is the tie-breaker.
+            return min(available, key=lambda stats: stats.score()).node
+
+    def latency_percentile(self, node, percentile, min_samples=5):
+        """Returns the given percentile of the node's recent latencies.
+        None if there are not enough samples."""
+        with self.lock:
+            latencies = sorted(self.stats[node].latency_samples)
+        if len(latencies) < min_samples:
+            return None
+        index = min(len(latencies) - 1,
+                    int(len(latencies) * percentile / 100))
+        return latencies[index]
+
+    def record_success(self, node, latency):
+        with self.lock:
+            stats = self.stats[node]
+            stats.latencies.append(latency)
+            stats.latency_samples.append(latency)
+            stats.outcomes.append(False)
+            stats.consecutive_failures = 0
+            stats.circuit_opened_at = None
+
+    def record_failure(self, node):
+        with self.lock:
+            stats = self.stats[node]
+            stats.outcomes.append(True)
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures < self.failure_threshold or \
+                    not stats.is_available:
+                return
+            stats.circuit_opened_at = time.monotonic()
+
+        self.start_probing(node)
+
+    def start_probing(self, node):
+        if self.probe is None or self.closed.is_set():
+            return
+
+        with self.lock:
+            if node in self.probes:
+                return
+            thread = threading.Thread(
+                target=self._probe_until_available, args=(node, ),
+                daemon=True)
+            self.probes[node] = thread
+        thread.start()
+
+    def _probe_until_available(self, node):
+        try:
+            while not self.closed.wait(self.probe_interval):
+                started_at = time.monotonic()
+                try:
+                    self.probe(node)
+                except Exception:
+                    with self.lock:
+                        self.stats[node].outcomes.append(True)
+                    continue
+                # let it back in.
+                self.record_success(node, time.monotonic() - started_at)
+                return
+        finally:
+            with self.lock:
+                self.probes.pop(node, None)
+
+    def get_stats(self):
+        with self.lock:
+            return {node: self.stats[node].as_dict() for node in self.nodes}
+
+    def close(self):
+        """Stops the background probes."""
+        self.closed.set()
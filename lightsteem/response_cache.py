@@ -0,0 +1,142 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def _block_num_of_condenser_call(params):
+    return params[0] if isinstance(params, (list, tuple)) and params \
+        else None
+
+
+def _block_num_of_appbase_call(params):
+    return params.get("block_num") if isinstance(params, dict) else None
+
+
+# immutable calls -> the function that finds the block number in the
+# params. The responses of these never change once the block is
+# irreversible.
+IMMUTABLE_METHODS = {
+    "condenser_api.get_block": _block_num_of_condenser_call,
+    "condenser_api.get_block_header": _block_num_of_condenser_call,
+    "condenser_api.get_ops_in_block": _block_num_of_condenser_call,
+    "block_api.get_block": _block_num_of_appbase_call,
+    "block_api.get_block_header": _block_num_of_appbase_call,
+    "account_history_api.get_ops_in_block": _block_num_of_appbase_call,
+}
+
+
+class ResponseCache:
+    """Caches the responses of the calls on irreversible blocks.
+
+    Responses are kept in memory (least recently used ones are dropped
+    after ``max_bytes``) and, if a ``path`` is given, in a SQLite database.
+
+    Only the calls in ``IMMUTABLE_METHODS`` are cached, and only if the
+    block is at or below the last irreversible block number seen in the
+    responses of get_dynamic_global_properties.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, path=None):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.responses = OrderedDict()
+        self.last_irreversible_block_num = None
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        self.lock = threading.Lock()
+        self.connection = None
+        if path:
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT)")
+            self.connection.commit()
+
+    def get_key(self, request_data):
+        """Returns the cache key of the request. None if it's not
+        cacheable."""
+        get_block_num = IMMUTABLE_METHODS.get(request_data.get("method"))
+        if get_block_num is None:
+            return None
+        params = request_data.get("params")
+        block_num = get_block_num(params)
+        if not isinstance(block_num, int):
+            return None
+        return "%s:%s" % (request_data["method"],
+                          json.dumps(params, sort_keys=True))
+
+    def observe(self, result):
+        """Keeps track of the last irreversible block number."""
+        if isinstance(result, dict) and \
+                "last_irreversible_block_num" in result:
+            with self.lock:
+                self.last_irreversible_block_num = max(
+                    self.last_irreversible_block_num or 0,
+                    result["last_irreversible_block_num"])
+
+    def is_irreversible(self, request_data):
+        block_num = IMMUTABLE_METHODS[request_data["method"]](
+            request_data["params"])
+        last_irreversible_block_num = self.last_irreversible_block_num
+        return last_irreversible_block_num is not None and \
+            block_num <= last_irreversible_block_num
+
+    def get(self, key):
+        """Returns the cached result (a fresh copy) or None."""
+        with self.lock:
+            response = self.responses.get(key)
+            if response is not None:
+                self.responses.move_to_end(key)
+                self.stats["hits"] += 1
+                return json.loads(response)
+
+            if self.connection is not None:
+                row = self.connection.execute(
+                    "SELECT response FROM responses WHERE key = ?",
+                    (key, )).fetchone()
+                if row:
+                    self.stats["disk_hits"] += 1
+                    self._remember(key, row[0])
+                    return json.loads(row[0])
+
+            self.stats["misses"] += 1
+            return None
+
+    def _remember(self, key, response):
+        if key in self.responses:
+            return
+        self.responses[key] = response
+        self.size += len(response)
+        while self.size > self.max_bytes and self.responses:
+            _, dropped = self.responses.popitem(last=False)
+            self.size -= len(dropped)
+
+    def store(self, request_data, result):
+        """Caches the result of the request if it's on an irreversible
+        block."""
+        key = self.get_key(request_data)
+        if key is None or result is None or \
+                not self.is_irreversible(request_data):
+            return
+        response = json.dumps(result)
+        with self.lock:
+            self._remember(key, response)
+            self.stats["stores"] += 1
+            if self.connection is not None:
+                with self.connection:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO responses (key, response) "
+                        "VALUES (?, ?)", (key, response))
+
+    def clear(self):
+        with self.lock:
+            self.responses.clear()
+            self.size = 0
+            if self.connection is not None:
+                with self.connection:
+                    self.connection.execute("DELETE FROM responses")
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
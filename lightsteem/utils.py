@@ -0,0 +1,25 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def ordered_prefetch(func, items, max_workers=4, window=8):
+    """Maps func over items with a thread pool and yields the results in
+    the order of items.
+
+    At most ``window`` calls are scheduled ahead of the consumer, so a
+    slow consumer doesn't make the whole input to be fetched into the
+    memory. The calls not started yet are cancelled when the generator
+    is closed.
+    """
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
@@ -11,8 +11,12 @@ setup(
     description='A light python client to interact with the STEEM blockchain',
     install_requires=["requests", "backoff", "ecdsa", "dateutils"],
     extras_require={
+        'async': [
+            'aiohttp'
+        ],
         'dev': [
-            'requests_mock'
+            'requests_mock',
+            'aiohttp',
         ]
     }
 )
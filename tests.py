@@ -1,18 +1,47 @@
+import asyncio
 import datetime
+import hashlib
 import json
+import os
+import tempfile
+import threading
+import time
 import unittest
+import ecdsa
 import pytz
 
+import requests
 import requests_mock
 
 import lightsteem.exceptions
+from lightsteem import async_client
+from lightsteem.async_client import AsyncClient
+from lightsteem.broadcast import base58
+from lightsteem.broadcast.key_objects import PublicKey, \
+    decode_public_keys, derive_addresses
+from lightsteem.broadcast.key_ring import KeyRing, is_canonical, \
+    recover_public_key
+from lightsteem.broadcast.serializer import serialize_transaction
 from lightsteem.client import Client
+from lightsteem.datastructures import Operation
+from lightsteem.node_selector import NodeSelector
+from lightsteem.response_cache import ResponseCache
 from lightsteem.helpers.account import Account
-from lightsteem.helpers.event_listener import EventListener
+from lightsteem.helpers.checkpoint import FileCheckpointStore, \
+    SQLiteCheckpointStore
+from lightsteem.helpers.event_listener import EventListener, \
+    TransactionListener
 from lightsteem.helpers.amount import Amount
+from lightsteem.helpers.rc import RCPoolSimulator
+from lightsteem.vendor.rc import STEEM_BLOCK_INTERVAL, RCModel, \
+    ResourceCount, ResourceCounter, compute_rc_cost_of_resource
 
 from tests_mockdata import mock_block_25926363, mock_dygp_result, \
-    mock_block_25926364, mock_history, mock_history_max_index
+    mock_block_25926364, mock_history, mock_history_max_index, \
+    mock_vote_transaction, mock_vote_transaction_hex, \
+    mock_transfer_transaction, mock_transfer_transaction_hex, \
+    mock_resource_params, mock_resource_pool, mock_rc_dygp, \
+    mock_serialized_operations
 
 
 class TestClient(unittest.TestCase):
@@ -22,8 +51,27 @@ class TestClient(unittest.TestCase):
         self.client = Client(nodes=TestClient.NODES)
 
     def test_dynamic_api_selection(self):
-        self.client('tags_api')
-        self.assertEqual('tags_api', self.client.api_type)
+        tags_api = self.client('tags_api')
+        self.assertEqual('tags_api', tags_api.api_type)
+        # the client itself is not changed.
+        self.assertEqual('condenser_api', self.client.api_type)
+        with self.assertRaises(AttributeError):
+            tags_api.api_type = 'rc_api'
+
+        with requests_mock.mock() as m:
+            m.post(TestClient.NODES[0], json={"result": {}})
+            tags_api.get_trending_tags(None, 10)
+            self.assertEqual(
+                "tags_api.get_trending_tags", m.last_request.json()["method"])
+
+        tags_api.get_discussion(None, batch=True)
+        self.assertEqual(1, len(self.client.queue))
+
+        # the client's attributes are not RPC calls.
+        self.assertIs(self.client.logger, tags_api.logger)
+        self.assertEqual("STEEM", tags_api.chain)
+        self.assertIs(
+            self.client.transaction_builder, tags_api.transaction_builder)
 
     def test_default_api_selection(self):
         with requests_mock.mock() as m:
@@ -31,11 +79,45 @@ class TestClient(unittest.TestCase):
             self.client.get_block(12323)
             self.assertEqual('condenser_api', self.client.api_type)
 
+    def test_sharing_between_threads(self):
+        def fake_send_request(url, request_data, timeout):
+            time.sleep(0.001)
+            if isinstance(request_data, list):
+                return [{"id": r["id"], "result": r["method"]}
+                        for r in request_data]
+            return {"id": request_data["id"],
+                    "result": request_data["method"]}
+
+        self.client._send_request_once = fake_send_request
+        self.client._send_request = fake_send_request
+
+        def worker(api_type):
+            api = self.client(api_type)
+            for i in range(20):
+                if api.get_config() != f"{api_type}.get_config":
+                    errors.append(api_type)
+                api.get_version(batch=True)
+                self.client.get_block(i, batch=True)
+                if self.client.process_batch() != [
+                        f"{api_type}.get_version",
+                        "condenser_api.get_block"]:
+                    errors.append(api_type)
+
+        errors = []
+        threads = [threading.Thread(target=worker, args=(api_type, ))
+                   for api_type in ["rc_api", "database_api"] * 8]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+
     def test_get_rpc_request_body_condenser_multiple_args(self):
-        self.client('condenser_api')
         rpc_body = self.client.get_rpc_request_body(
             ('get_account_bandwidth', 'steemit', 'forum'),
-            {'batch': True, 'id': 1}
+            {'batch': True, 'id': 1},
+            api_type='condenser_api',
         )
 
         self.assertEqual(
@@ -49,10 +131,10 @@ class TestClient(unittest.TestCase):
         )
 
     def test_get_rpc_request_body_condenser_single_arg(self):
-        self.client('condenser_api')
         rpc_body = self.client.get_rpc_request_body(
             ('get_block', '123'),
             {},
+            api_type='condenser_api',
         )
 
         self.assertEqual(
@@ -61,11 +143,11 @@ class TestClient(unittest.TestCase):
         )
 
     def test_get_rpc_request_body_non_condenser_api_with_arg(self):
-        self.client('database_api')
         rpc_body = self.client.get_rpc_request_body(
             ('list_vesting_delegations',
              {"start": [None], "limit": 20, "order": "by_delegation"}),
             {},
+            api_type='database_api',
         )
 
         self.assertEqual(
@@ -74,10 +156,10 @@ class TestClient(unittest.TestCase):
         )
 
     def test_get_rpc_request_body_non_condenser_api_no_arg(self):
-        self.client('database_api')
         rpc_body = self.client.get_rpc_request_body(
             ('get_active_witnesses',),
             {},
+            api_type='database_api',
         )
 
         self.assertEqual({}, rpc_body["params"])
@@ -157,6 +239,689 @@ class TestClient(unittest.TestCase):
             self.client.process_batch()
             self.assertEqual(0, len(self.client.queue))
 
+    def test_process_batch_in_chunks(self):
+        def batch_response(request, context):
+            # answer in the reverse order to check the reassembly.
+            return [{"id": r["id"], "result": r["params"][0]}
+                    for r in reversed(request.json())]
+
+        with requests_mock.mock() as m:
+            m.post(TestClient.NODES[0], json=batch_response)
+            for block_num in range(1, 8):
+                self.client.get_block(block_num, batch=True)
+
+            result = self.client.process_batch(chunk_size=3)
+
+            self.assertEqual(3, m.call_count)
+            self.assertEqual(list(range(1, 8)), result)
+
+    def test_process_batch_per_item_errors(self):
+        def batch_response(request, context):
+            response = []
+            for r in request.json():
+                if r["params"][0] == 2:
+                    response.append({"id": r["id"], "error": {
+                        "code": -32000, "message": "Unknown block"}})
+                else:
+                    response.append({"id": r["id"], "result": r["params"][0]})
+            return response
+
+        with requests_mock.mock() as m:
+            m.post(TestClient.NODES[0], json=batch_response)
+            for block_num in range(1, 4):
+                self.client.get_block(block_num, batch=True)
+            result = self.client.process_batch(raise_on_error=False)
+
+            self.assertEqual(1, result[0])
+            self.assertIsInstance(
+                result[1], lightsteem.exceptions.RPCNodeException)
+            self.assertEqual(3, result[2])
+
+            self.client.get_block(2, batch=True)
+            with self.assertRaises(lightsteem.exceptions.RPCNodeException):
+                self.client.process_batch()
+
+    def test_session_is_reused(self):
+        with requests_mock.mock() as m:
+            m.post(TestClient.NODES[0], json={"result": {}})
+            self.client.get_block(1)
+            session = self.client.get_session(TestClient.NODES[0])
+            self.client.get_block(2)
+
+            self.assertEqual(1, len(self.client.sessions))
+            self.assertIs(
+                session, self.client.get_session(TestClient.NODES[0]))
+
+    def test_idle_session_is_evicted(self):
+        self.client.pool_idle_timeout = 0
+        session = self.client.get_session(TestClient.NODES[0])
+        self.client.sessions[TestClient.NODES[0]][1] -= 1
+
+        self.assertIsNot(
+            session, self.client.get_session(TestClient.NODES[0]))
+
+    def test_next_node_drops_session_of_previous_node(self):
+        client = Client(nodes=["https://node1", "https://node2"])
+        client.get_session("https://node1")
+        client.next_node()
+
+        self.assertEqual("https://node2", client.current_node)
+        self.assertNotIn("https://node1", client.sessions)
+
+    def test_failover_without_retrying_dead_node(self):
+        client = Client(nodes=["https://node1", "https://node2"])
+        with requests_mock.mock() as m:
+            m.post("https://node1",
+                   exc=requests.exceptions.ConnectTimeout)
+            m.post("https://node2", json={"result": {}})
+            for _ in range(5):
+                self.assertEqual({}, client.get_dynamic_global_properties())
+
+            # failed over right away, without the backoff retries, and
+            # stayed on the healthy node.
+            self.assertEqual(1, len([
+                r for r in m.request_history if "node1" in r.url]))
+            self.assertEqual(5, len([
+                r for r in m.request_history if "node2" in r.url]))
+
+        client.close()
+
+
+class TestHedgedRequests(unittest.TestCase):
+    NODES = ["https://node1", "https://node2"]
+
+    def setUp(self):
+        self.client = Client(nodes=self.NODES, hedge=True, hedge_delay=0.05)
+
+    def tearDown(self):
+        self.client.close()
+
+    def fake_send_request(self, url, request_data, timeout):
+        # requests_mock serializes the requests, can't use it here.
+        self.requests.append((url, request_data["method"]))
+        if url == "https://node1":
+            time.sleep(0.5)
+        return {"id": request_data["id"], "result": url}
+
+    def test_slow_read_is_hedged(self):
+        self.requests = []
+        self.client._send_request_once = self.fake_send_request
+        self.assertEqual("https://node2", self.client.get_block(1))
+
+        self.assertEqual(2, len(self.requests))
+        self.assertEqual(
+            {"requests": 1, "fired": 1, "won": 1}, self.client.hedge_stats)
+
+    def test_broadcasts_are_not_hedged(self):
+        self.requests = []
+        self.client._send_request = self.fake_send_request
+        self.client._send_request_once = self.fake_send_request
+        self.assertEqual(
+            "https://node1", self.client.broadcast_transaction({}))
+
+        self.assertEqual([(
+            "https://node1", "condenser_api.broadcast_transaction")],
+            self.requests)
+        self.assertEqual(
+            {"requests": 0, "fired": 0, "won": 0}, self.client.hedge_stats)
+
+
+class TestCoalescing(unittest.TestCase):
+
+    def fake_send_request(self, url, request_data, timeout):
+        # requests_mock serializes the requests, can't use it here.
+        self.requests.append(request_data)
+        time.sleep(0.2)
+        if isinstance(request_data, list):
+            return [{"id": r["id"], "result": r["method"]}
+                    for r in request_data]
+        return {"id": request_data["id"], "result": request_data["method"]}
+
+    def test_identical_reads_are_coalesced(self):
+        client = Client(nodes=TestClient.NODES)
+        self.requests = []
+        client._send_request_once = self.fake_send_request
+        client._send_request = self.fake_send_request
+
+        def get_properties():
+            results.append(client.get_dynamic_global_properties())
+
+        def get_batch():
+            results.append(client.request(batch_data=[{
+                "jsonrpc": "2.0", "method": method, "params": params,
+                "id": client.pick_id_for_request(),
+            } for method, params in [("condenser_api.get_block", [1]),
+                                     ("rc_api.get_resource_pool", {})]]))
+
+        results = []
+        threads = [threading.Thread(target=target)
+                   for target in [get_properties] * 4 + [get_batch] * 2]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(2, len(self.requests))
+        self.assertEqual(
+            ["condenser_api.get_dynamic_global_properties"] * 4 +
+            [["condenser_api.get_block", "rc_api.get_resource_pool"]] * 2,
+            sorted(results, key=lambda result: isinstance(result, list)))
+        self.assertEqual(
+            {"requests": 6, "coalesced": 4}, client.coalesce_stats)
+        self.assertAlmostEqual(4 / 6, client.coalesce_ratio)
+
+        # broadcasts are never coalesced.
+        client.broadcast_transaction({})
+        client.broadcast_transaction({})
+        self.assertEqual(4, len(self.requests))
+        self.assertEqual(6, client.coalesce_stats["requests"])
+
+    def test_single_calls_are_not_coalesced_with_batches(self):
+        client = Client(nodes=TestClient.NODES)
+        self.requests = []
+        client._send_request_once = self.fake_send_request
+        client._send_request = self.fake_send_request
+
+        def get_ops():
+            results.append(client.get_ops_in_block(5, False))
+
+        def get_ops_batch():
+            results.append(client.send_batch([
+                client.get_rpc_request_body(
+                    ("get_ops_in_block", 5, False), {})]))
+
+        results = []
+        threads = [threading.Thread(target=target)
+                   for target in [get_ops, get_ops_batch] * 2]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(2, len(self.requests))
+        self.assertEqual(
+            ["condenser_api.get_ops_in_block"] * 2 +
+            [["condenser_api.get_ops_in_block"]] * 2,
+            sorted(results, key=lambda result: isinstance(result, list)))
+        self.assertEqual(
+            {"requests": 4, "coalesced": 2}, client.coalesce_stats)
+
+class TestNodeSelector(unittest.TestCase):
+    NODES = ["https://node1", "https://node2", "https://node3"]
+
+    def test_best_node(self):
+        selector = NodeSelector(self.NODES)
+        # every node is tried first.
+        self.assertEqual("https://node1", selector.best_node())
+        selector.record_success("https://node1", 0.5)
+        self.assertEqual("https://node2", selector.best_node())
+        selector.record_success("https://node2", 0.1)
+        selector.record_success("https://node3", 0.3)
+
+        self.assertEqual("https://node2", selector.best_node())
+        self.assertEqual(
+            "https://node3", selector.best_node(exclude=["https://node2"]))
+
+        # errors make the node less attractive
+        selector.record_failure("https://node2")
+        self.assertEqual("https://node3", selector.best_node())
+
+    def test_latency_percentile(self):
+        selector = NodeSelector(self.NODES)
+        for latency in [0.1, 0.2, 0.3, 0.4]:
+            selector.record_success("https://node1", latency)
+        self.assertIsNone(selector.latency_percentile("https://node1", 90))
+
+        selector.record_success("https://node1", 5)
+        self.assertEqual(5, selector.latency_percentile("https://node1", 90))
+        self.assertEqual(
+            0.3, selector.latency_percentile("https://node1", 50))
+
+    def test_circuit_breaker(self):
+        node_is_down = threading.Event()
+        node_is_down.set()
+
+        def probe(node):
+            if node_is_down.is_set():
+                raise ValueError("node is down")
+            probed.set()
+
+        probed = threading.Event()
+        selector = NodeSelector(
+            self.NODES[:2], probe=probe, failure_threshold=2,
+            probe_interval=0.01)
+        selector.record_failure("https://node1")
+        self.assertTrue(selector.get_stats()["https://node1"]["available"])
+        selector.record_failure("https://node1")
+        self.assertFalse(selector.get_stats()["https://node1"]["available"])
+        self.assertEqual("https://node2", selector.best_node())
+
+        # all circuits are open, the one failed first is the best bet.
+        selector.record_failure("https://node2")
+        selector.record_failure("https://node2")
+        self.assertEqual("https://node1", selector.best_node())
+
+        node_is_down.clear()
+        self.assertTrue(probed.wait(5))
+        time.sleep(0.05)
+        self.assertTrue(selector.get_stats()["https://node1"]["available"])
+        selector.close()
+
+
+class TestResponseCache(unittest.TestCase):
+    NODES = ["https://node1"]
+
+    def mock_node(self, m):
+        def response(request, context):
+            request_data = request.json()
+            if isinstance(request_data, list):
+                return [response_of(r) for r in request_data]
+            return response_of(request_data)
+
+        def response_of(request_data):
+            self.requests.append(request_data["method"])
+            if "get_dynamic_global_properties" in request_data["method"]:
+                result = {"head_block_number": 120,
+                          "last_irreversible_block_num": 100}
+            else:
+                result = {"block_num": request_data["params"][0]}
+            return {"id": request_data["id"], "result": result}
+
+        self.requests = []
+        m.post(self.NODES[0], json=response)
+
+    def test_replaying_irreversible_blocks(self):
+        client = Client(nodes=self.NODES, response_cache=ResponseCache())
+        with requests_mock.mock() as m:
+            self.mock_node(m)
+            client.get_dynamic_global_properties()
+            for _ in range(2):
+                for block_num in range(95, 101):
+                    client.get_block(block_num, batch=True)
+                self.assertEqual(
+                    [{"block_num": n} for n in range(95, 101)],
+                    client.process_batch())
+                self.assertEqual(
+                    {"block_num": 99}, client.get_block(99))
+
+        # the second replay is served from the cache.
+        self.assertEqual(6, self.requests.count("condenser_api.get_block"))
+        self.assertEqual(8, client.response_cache.stats["hits"])
+
+    def test_partly_cached_batch(self):
+        client = Client(nodes=self.NODES, response_cache=ResponseCache())
+        with requests_mock.mock() as m:
+            self.mock_node(m)
+            client.get_dynamic_global_properties()
+            client.get_block(5)
+            self.requests = []
+            result = client.request(batch_data=[
+                client.get_rpc_request_body(("get_block", block_num), {})
+                for block_num in [3, 4, 5, 6]])
+
+        self.assertEqual(
+            [{"block_num": n} for n in [3, 4, 5, 6]], result)
+        self.assertEqual(3, self.requests.count("condenser_api.get_block"))
+
+    def test_reversible_blocks_are_not_cached(self):
+        client = Client(nodes=self.NODES, response_cache=ResponseCache())
+        with requests_mock.mock() as m:
+            self.mock_node(m)
+            # the last irreversible block is not known yet.
+            client.get_block(90)
+            client.get_dynamic_global_properties()
+            client.get_block(101)
+            client.get_block(101)
+            client.get_block(90)
+
+        self.assertEqual(4, self.requests.count("condenser_api.get_block"))
+        self.assertEqual(0, client.response_cache.stats["hits"])
+
+    def test_disk_cache(self):
+        request_data = {"method": "block_api.get_block",
+                        "params": {"block_num": 1}}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "responses.db")
+            cache = ResponseCache(path=path)
+            cache.observe({"last_irreversible_block_num": 100})
+            cache.store(request_data, {"block": {"previous": "00"}})
+            cache.close()
+
+            cache = ResponseCache(max_bytes=1, path=path)
+            key = cache.get_key(request_data)
+            self.assertEqual({"block": {"previous": "00"}}, cache.get(key))
+            self.assertEqual(1, cache.stats["disk_hits"])
+            # doesn't fit into the memory.
+            self.assertEqual(0, len(cache.responses))
+            cache.close()
+
+
+@unittest.skipIf(async_client.aiohttp is None, "aiohttp is not installed")
+class TestAsyncClient(unittest.TestCase):
+    NODES = ["https://node1", "https://node2"]
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.client = AsyncClient(nodes=TestAsyncClient.NODES)
+        self.sent = []
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.client.close())
+        self.loop.close()
+
+    async def fake_send_request(self, url, request_data):
+        self.sent.append((url, request_data))
+        await asyncio.sleep(0)
+        if isinstance(request_data, list):
+            return [{"result": r["params"]} for r in request_data]
+        return {"result": request_data["method"]}
+
+    def test_dynamic_method_dispatch(self):
+        self.client._send_request = self.fake_send_request
+        self.client._send_request_once = self.fake_send_request
+
+        async def run():
+            return await asyncio.gather(
+                self.client.get_block(1),
+                self.client('rc_api').find_rc_accounts({"accounts": []}),
+            )
+
+        result = self.loop.run_until_complete(run())
+        self.assertEqual(
+            ["condenser_api.get_block", "rc_api.find_rc_accounts"], result)
+
+    def test_process_batch(self):
+        self.client._send_request = self.fake_send_request
+        self.client._send_request_once = self.fake_send_request
+        self.client.get_block(1, batch=True)
+        self.client.get_block(2, batch=True)
+
+        result = self.loop.run_until_complete(self.client.process_batch())
+        self.assertEqual([(1, ), (2, )], result)
+        self.assertEqual(0, len(self.client.queue))
+
+    def test_failover(self):
+        async def send_request(url, request_data):
+            if url == "https://node1":
+                raise async_client.aiohttp.ClientError("node is down")
+            return await self.fake_send_request(url, request_data)
+
+        self.client._send_request = send_request
+        self.client._send_request_once = send_request
+        result = self.loop.run_until_complete(self.client.get_block(1))
+
+        self.assertEqual("condenser_api.get_block", result)
+        self.assertEqual("https://node2", self.client.current_node)
+        # node1 is tried once, node2 takes the traffic from now on.
+        self.loop.run_until_complete(self.client.get_block(2))
+        self.assertEqual(
+            ["https://node2", "https://node2"],
+            [url for url, _ in self.sent])
+
+
+class TestTransactionBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.client = Client(
+            nodes=TestClient.NODES,
+            keys=["5KQwrPbwdL6PhXujxW37FSSQZ1JiwsST4cqQzDeyXtP79zkvFD3"])
+
+    def test_serialize_transaction(self):
+        self.assertEqual(
+            mock_vote_transaction_hex,
+            serialize_transaction(mock_vote_transaction).hex())
+        self.assertEqual(
+            mock_transfer_transaction_hex,
+            serialize_transaction(mock_transfer_transaction).hex())
+
+    def test_serialize_special_operations(self):
+        for operation, expected_hex in mock_serialized_operations:
+            transaction = dict(mock_vote_transaction, operations=[operation])
+            self.assertEqual(
+                expected_hex, serialize_transaction(transaction).hex(),
+                operation[0])
+
+    def test_missing_fields_are_serialized_by_the_node(self):
+        # the node's default for approve is true, can't pack it locally.
+        transaction = dict(mock_vote_transaction, operations=[
+            ['account_witness_vote', {
+                'account': 'emrebeyler', 'witness': 'emrebeyler'}]])
+        with self.assertRaises(NotImplementedError):
+            serialize_transaction(transaction)
+
+        with requests_mock.mock() as m:
+            self.mock_reference_block(m)
+            m.post(TestClient.NODES[0], json={
+                "result": mock_vote_transaction_hex},
+                additional_matcher=lambda request:
+                'get_transaction_hex' in request.text)
+            tx = self.client.broadcast(Operation('comment_options', {
+                "author": "emrebeyler",
+                "permlink": "test",
+                "max_accepted_payout": "1000000.000 SBD",
+                "allow_votes": True,
+                "allow_curation_rewards": True,
+            }), dry_run=True)
+
+            self.assertEqual(
+                "condenser_api.get_transaction_hex",
+                m.last_request.json()["method"])
+            self.assertEqual(1, len(tx["signatures"]))
+
+    def test_serialize_signed_transaction(self):
+        signature = "1f" + "ab" * 64
+        transaction = dict(mock_vote_transaction, signatures=[signature])
+
+        self.assertEqual(
+            mock_vote_transaction_hex[:-2] + "01" + signature,
+            serialize_transaction(transaction).hex())
+
+    def mock_reference_block(self, m):
+        def match_dygp(request):
+            return 'get_dynamic_global_properties' in request.text
+
+        def match_get_block(request):
+            return 'get_block' in request.text
+
+        m.post(TestClient.NODES[0], json={"result": {
+            "head_block_number": 25926366,
+            "time": "2018-09-13T14:31:39",
+        }}, additional_matcher=match_dygp)
+        m.post(TestClient.NODES[0], json={"result": {
+            "previous": "018b9adc0aeacf3dc2febe6e869e5ba7269ca005",
+        }}, additional_matcher=match_get_block)
+
+    def test_broadcast_without_get_transaction_hex(self):
+        with requests_mock.mock() as m:
+            self.mock_reference_block(m)
+            tx = self.client.broadcast(Operation('vote', {
+                "voter": "emrebeyler",
+                "author": "emrebeyler",
+                "permlink": "test",
+                "weight": 100,
+            }), dry_run=True)
+
+            self.assertEqual(2, m.call_count)
+            self.assertEqual(1, len(tx["signatures"]))
+
+    def test_broadcast_from_multiple_threads(self):
+        builder = self.client.transaction_builder
+
+        def broadcast(thread_index):
+            try:
+                broadcast_many(thread_index)
+            except Exception as e:
+                errors.append(e)
+
+        def broadcast_many(thread_index):
+            for i in range(30):
+                permlink = "test-%s-%s" % (thread_index, i)
+                tx = self.client.broadcast(Operation('vote', {
+                    "voter": "emrebeyler",
+                    "author": "emrebeyler",
+                    "permlink": permlink,
+                    "weight": 100,
+                }), dry_run=True)
+                digest = builder.get_digest(
+                    self.client.chain, builder.get_transaction_hex(
+                        dict(tx, signatures=[])))
+                if tx["operations"][0][1]["permlink"] != permlink or \
+                        tx["signatures"] != self.client.keys.sign(digest):
+                    errors.append(permlink)
+
+        errors = []
+        with requests_mock.mock() as m:
+            self.mock_reference_block(m)
+            builder.reference_block_cache.get()
+            threads = [threading.Thread(target=broadcast, args=(i, ))
+                       for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual([], errors)
+
+    def test_reference_block_is_cached(self):
+        builder = self.client.transaction_builder
+        with requests_mock.mock() as m:
+            self.mock_reference_block(m)
+            builder.prepare()
+            # pretend the reference block is fetched 10 seconds ago.
+            builder.reference_block_cache.reference["fetched_at"] -= 10
+            builder.prepare()
+
+            self.assertEqual(2, m.call_count)
+            self.assertEqual(25926363 & 0xFFFF,
+                             builder.transaction["ref_block_num"])
+            self.assertEqual(1037036042,
+                             builder.transaction["ref_block_prefix"])
+            self.assertEqual("2018-09-13T14:32:19",
+                             builder.transaction["expiration"])
+
+    def test_keys_are_parsed_once(self):
+        keys = self.client.keys
+        self.assertIsInstance(keys, KeyRing)
+        self.assertEqual(
+            ["5KQwrPbwdL6PhXujxW37FSSQZ1JiwsST4cqQzDeyXtP79zkvFD3"],
+            list(keys))
+
+        digest = hashlib.sha256(b"lightsteem").digest()
+        signature = keys.sign(digest)[0]
+        keys.sign(digest)
+
+        self.assertEqual(1, len(keys.cached_keys))
+        self.assertEqual(2, keys.signature_stats["count"])
+
+        signature = bytes.fromhex(signature)
+        public_key = recover_public_key(
+            digest, signature[1:], signature[0] - 27 - 4)
+        self.assertEqual(
+            keys.get(keys[0]).ecdsa_key.get_verifying_key().to_string(),
+            public_key.to_string())
+
+    def test_deterministic_signatures(self):
+        key = self.client.keys.get(self.client.keys[0])
+        public_key = key.ecdsa_key.get_verifying_key()
+        order = ecdsa.SECP256k1.order
+        for i in range(10):
+            digest = hashlib.sha256(b"lightsteem-%d" % i).digest()
+            signature = bytes.fromhex(key.sign(digest))
+
+            self.assertEqual(signature.hex(), key.sign(digest))
+            self.assertTrue(is_canonical(signature[1:]))
+            r, s = ecdsa.util.sigdecode_string(signature[1:], order)
+            self.assertLessEqual(s, order // 2)
+            self.assertEqual(public_key.to_string(), recover_public_key(
+                digest, signature[1:], signature[0] - 31).to_string())
+
+    def test_sign_many(self):
+        builder = self.client.transaction_builder
+        operations = [Operation('vote', {
+            "voter": "emrebeyler",
+            "author": "emrebeyler",
+            "permlink": "test-%s" % i,
+            "weight": 100,
+        }) for i in range(3)]
+        with requests_mock.mock() as m:
+            self.mock_reference_block(m)
+            transactions = builder.sign_many(
+                operations + [mock_vote_transaction], chain="STEEM",
+                max_workers=2, chunk_size=1)
+            self.assertEqual(2, m.call_count)
+
+        self.assertEqual(4, len(transactions))
+        public_key = self.client.keys.get(
+            self.client.keys[0]).ecdsa_key.get_verifying_key()
+        for i, transaction in enumerate(transactions):
+            if i < 3:
+                self.assertEqual(
+                    "test-%s" % i, transaction["operations"][0][1]["permlink"])
+            digest = builder.derive_digest("STEEM", builder.get_transaction_hex(
+                dict(transaction, signatures=[])))
+            signature = bytes.fromhex(transaction["signatures"][0])
+            self.assertEqual(public_key.to_string(), recover_public_key(
+                digest, signature[1:], signature[0] - 31).to_string())
+
+    def test_get_transaction_hex_falls_back_to_node(self):
+        transaction = dict(mock_vote_transaction, operations=[
+            ['pow', {'worker_account': 'foo'}]])
+
+        with requests_mock.mock() as m:
+            m.post(TestClient.NODES[0], json={"result": "00"})
+            self.assertEqual(
+                "00",
+                self.client.transaction_builder.get_transaction_hex(
+                    transaction))
+            self.assertEqual(1, m.call_count)
+
+
+class TestBase58(unittest.TestCase):
+
+    WIF = "5KQwrPbwdL6PhXujxW37FSSQZ1JiwsST4cqQzDeyXtP79zkvFD3"
+    SECRET = "d2653ff7cbb2d8ff129ac27ef5781ce68b2558c41a74af1f2ddca635cbeef07d"
+
+    def test_wif(self):
+        self.assertEqual(self.SECRET, base58.base58CheckDecode(self.WIF))
+        self.assertEqual(
+            self.WIF, base58.base58CheckEncode(0x80, self.SECRET))
+        self.assertEqual(self.WIF, format(base58.Base58(self.SECRET), "wif"))
+
+    def test_leading_zeroes(self):
+        self.assertEqual("11", base58.b58encode(b"\0\0"))
+        self.assertEqual(b"\0\0\1", base58.b58decode("112"))
+        self.assertEqual("0000ff", base58.base58decode(
+            base58.base58encode("0000ff")))
+
+    def test_invalid_character(self):
+        with self.assertRaises(ValueError):
+            base58.b58decode("5KQwrPbwdL6Ph0")
+
+
+class TestPublicKeys(unittest.TestCase):
+
+    PUBLIC_KEY = "STM6MRyAjQq8ud7hVNYcfnVPJqcVpscN5So8BhtHuGYqET5GDW5CV"
+
+    def test_decode_public_keys(self):
+        invalid_checksum = self.PUBLIC_KEY[:-1] + "W"
+        keys = [self.PUBLIC_KEY, invalid_checksum, "TST1", "STM0"]
+
+        decoded = list(decode_public_keys(keys))
+        key, checksum = decoded[0]
+        self.assertEqual(bytes(PublicKey(self.PUBLIC_KEY)), key)
+        self.assertEqual(4, len(checksum))
+        self.assertEqual([None, None, None], decoded[1:])
+        self.assertEqual(
+            [True, False, False, False],
+            list(decode_public_keys(keys, verify_only=True)))
+
+    def test_derive_addresses(self):
+        public_key = PublicKey(self.PUBLIC_KEY)
+        self.assertEqual(
+            [str(public_key.address)] * 2 + [None],
+            list(derive_addresses(
+                [self.PUBLIC_KEY, bytes(public_key), "STM0"])))
+
 
 class TestAccountHelper(unittest.TestCase):
 
@@ -294,6 +1059,73 @@ class TestAccountHelper(unittest.TestCase):
 
             self.assertEqual(3, history[0][0])
 
+    def test_account_history_parallel_pages(self):
+        def history_response(request, context):
+            account, index, limit = request.json()["params"]
+            if index == -1:
+                index, limit = 10, 0
+            return {"result": [
+                [i, {"timestamp": "2018-08-17T18:%02d:00" % i,
+                     "op": ["transfer", {"index": i}]}]
+                for i in range(index - limit, min(index, 10) + 1)]}
+
+        with requests_mock.mock() as m:
+            m.post(TestClient.NODES[0], json=history_response)
+            account = Account(self.client)
+
+            history = list(account.history(account="hellosteem", limit=3))
+            self.assertEqual(
+                list(range(10, -1, -1)), [op["index"] for op in history])
+
+            history = list(account.history(
+                account="hellosteem", limit=3, order="asc"))
+            self.assertEqual(
+                list(range(0, 11)), [op["index"] for op in history])
+
+            history = list(account.history(
+                account="hellosteem", limit=3,
+                stop_at=datetime.datetime(2018, 8, 17, 18, 5)))
+            self.assertEqual(
+                list(range(10, 4, -1)), [op["index"] for op in history])
+
+    def test_account_history_operation_filter(self):
+        def history_response(request, context):
+            params = request.json()["params"]
+            if params[1] == -1:
+                return {"result": mock_history_max_index}
+            if len(params) > 3:
+                self.assertEqual([4, 0], params[3:])
+                return {"result": [mock_history[0], mock_history[2]]}
+            return {"result": mock_history}
+
+        with requests_mock.mock() as m:
+            m.post(TestClient.NODES[0], json=history_response)
+            account = Account(self.client)
+            history = list(
+                account.history(account="hellosteem", filter=["transfer"]))
+
+            self.assertEqual(2, len(history))
+            self.assertTrue(account.supports_operation_filter)
+
+    def test_account_history_operation_filter_fallback(self):
+        def history_response(request, context):
+            params = request.json()["params"]
+            if params[1] == -1:
+                return {"result": mock_history_max_index}
+            if len(params) > 3:
+                return {"error": {"code": -32003,
+                                  "message": "Assert Exception"}}
+            return {"result": mock_history}
+
+        with requests_mock.mock() as m:
+            m.post(TestClient.NODES[0], json=history_response)
+            account = Account(self.client)
+            history = list(
+                account.history(account="hellosteem", filter=["transfer"]))
+
+            self.assertEqual(2, len(history))
+            self.assertFalse(account.supports_operation_filter)
+
 
 class TestEventListener(unittest.TestCase):
 
@@ -358,6 +1190,292 @@ class TestEventListener(unittest.TestCase):
 
             self.assertEqual(1, len(ops))
 
+    def test_catch_up(self):
+        def match_dygp(request):
+            return 'get_dynamic_global_properties' in request.text
+
+        def match_batch(request):
+            return isinstance(request.json(), list)
+
+        def batch_response(request, context):
+            return [{"id": r["id"], "result": [{"block": r["params"][0]}]}
+                    for r in request.json()]
+
+        with requests_mock.mock() as m:
+            m.post(TestClient.NODES[0], json=mock_dygp_result,
+                   additional_matcher=match_dygp)
+            m.post(TestClient.NODES[0], json=batch_response,
+                   additional_matcher=match_batch)
+
+            listener = TransactionListener(
+                self.client,
+                start_block=25926000,
+                end_block=25926299,
+                catch_up_batch_size=20)
+            ops = list(listener.listen())
+
+            self.assertEqual(
+                list(range(25926000, 25926300)),
+                [op["block"] for op in ops])
+            # one dygp call and 15 batch calls.
+            self.assertEqual(16, m.call_count)
+
+    def test_last_block_height_is_cached(self):
+        def match_dygp(request):
+            return 'get_dynamic_global_properties' in request.text
+
+        def match_ops(request):
+            return 'get_ops_in_block' in request.text
+
+        with requests_mock.mock() as m:
+            m.post(TestClient.NODES[0], json=mock_dygp_result,
+                   additional_matcher=match_dygp)
+            m.post(TestClient.NODES[0], json={"result": [{}]},
+                   additional_matcher=match_ops)
+
+            listener = TransactionListener(
+                self.client,
+                start_block=25926360,
+                end_block=25926366)
+            ops = list(listener.listen())
+
+            self.assertEqual(7, len(ops))
+            self.assertEqual(1, listener.stats["height_refreshes"])
+            self.assertEqual(6, listener.stats["saved_height_refreshes"])
+
+    def test_listen_from_the_last_block(self):
+        class Waiting(Exception):
+            pass
+
+        def wait_for_next_block():
+            raise Waiting()
+
+        with requests_mock.mock() as m:
+            m.post(TestClient.NODES[0], json=mock_dygp_result)
+            listener = TransactionListener(self.client)
+            listener.wait_for_next_block = wait_for_next_block
+            with self.assertRaises(Waiting):
+                next(listener.listen())
+
+            # the height fetched for the start block is reused.
+            self.assertEqual(1, m.call_count)
+            self.assertEqual(1, listener.stats["height_refreshes"])
+
+    def assert_resumes_from_checkpoint(self, create_store):
+        def match_dygp(request):
+            return 'get_dynamic_global_properties' in request.text
+
+        def match_block_25926363(request):
+            return '25926363' in request.text
+
+        def match_block_25926364(request):
+            return '25926364' in request.text
+
+        with requests_mock.mock() as m:
+            m.post(TestClient.NODES[0], json=mock_dygp_result,
+                   additional_matcher=match_dygp)
+            m.post(TestClient.NODES[0], json=mock_block_25926363,
+                   additional_matcher=match_block_25926363)
+            m.post(TestClient.NODES[0], json=mock_block_25926364,
+                   additional_matcher=match_block_25926364)
+
+            all_ops = list(TransactionListener(
+                self.client,
+                start_block=25926363,
+                end_block=25926364).listen())
+
+            stream = TransactionListener(
+                self.client,
+                start_block=25926363,
+                end_block=25926364,
+                checkpoint=create_store()).listen()
+            processed = [next(stream) for _ in range(3)]
+            stream.close()
+
+            store = create_store()
+            # the third op is not processed yet, the consumer didn't
+            # ask for the next one.
+            self.assertEqual((25926363, 1), store.load())
+            resumed = list(TransactionListener(
+                self.client,
+                start_block=25926000,
+                end_block=25926364,
+                checkpoint=store).listen())
+
+            self.assertEqual(all_ops, processed[:2] + resumed)
+            self.assertEqual((25926364, None), create_store().load())
+
+    def test_file_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoint.json")
+            self.assert_resumes_from_checkpoint(
+                lambda: FileCheckpointStore(path))
+
+    def test_sqlite_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoint.db")
+            self.assert_resumes_from_checkpoint(
+                lambda: SQLiteCheckpointStore(path, name="transfers"))
+
+
+class TestResourceCreditHelper(unittest.TestCase):
+
+    def setUp(self):
+        self.client = Client(nodes=TestClient.NODES)
+        self.operation = Operation('vote', {
+            "voter": "emrebeyler",
+            "author": "emrebeyler",
+            "permlink": "test",
+            "weight": 100,
+        })
+
+    def mock_node(self, m):
+        def callback(request, context):
+            data = json.loads(request.text)
+            if isinstance(data, dict):
+                results = {
+                    "condenser_api.get_dynamic_global_properties": {
+                        "head_block_number": 25926366,
+                        "time": "2018-09-13T14:31:39"},
+                    "condenser_api.get_block": {
+                        "previous": "018b9adc0aeacf3dc2febe6e869e5ba7269ca005"},
+                }
+                return {"id": data["id"], "result": results[data["method"]]}
+
+            self.rc_batches.append([r["method"] for r in data])
+            results = {
+                "condenser_api.get_dynamic_global_properties": mock_rc_dygp,
+                "rc_api.get_resource_params": mock_resource_params,
+                "rc_api.get_resource_pool": mock_resource_pool,
+            }
+            return [{"id": r["id"], "result": results[r["method"]]}
+                    for r in data]
+
+        self.rc_batches = []
+        m.post(TestClient.NODES[0], json=callback)
+
+    def test_get_cost_caches_rc_params_and_pools(self):
+        rc = self.client.rc()
+        self.assertIs(rc, self.client.rc())
+        with requests_mock.mock() as m:
+            self.mock_node(m)
+            cost = rc.get_cost(self.operation)
+            self.assertGreater(cost, 0)
+            self.assertEqual(cost, rc.get_cost(self.operation))
+            self.assertEqual(1, len(self.rc_batches))
+            self.assertEqual(3, len(self.rc_batches[0]))
+
+            # a new block: only the pools are refreshed.
+            rc.context.pool_fetched_at -= STEEM_BLOCK_INTERVAL + 1
+            rc.get_cost(self.operation)
+            self.assertEqual(2, len(self.rc_batches))
+            self.assertNotIn(
+                "rc_api.get_resource_params", self.rc_batches[1])
+
+            rc.context.invalidate_pool()
+            rc.get_cost(self.operation)
+            self.assertEqual(3, len(self.rc_batches))
+            self.assertEqual(2, len(self.rc_batches[2]))
+
+            rc.invalidate()
+            rc.get_cost(self.operation)
+            self.assertEqual(3, len(self.rc_batches[3]))
+
+        self.assertEqual("condenser_api", self.client.api_type)
+
+    def test_queued_calls_are_not_sent(self):
+        with requests_mock.mock() as m:
+            self.mock_node(m)
+            self.client.get_block(1, batch=True)
+            self.assertGreater(self.client.rc().get_cost(self.operation), 0)
+
+        self.assertEqual(1, len(self.client.queue))
+        self.assertEqual(3, len(self.rc_batches[0]))
+
+    def test_get_costs(self):
+        operations = [self.operation, Operation('transfer', {
+            "from": "emrebeyler",
+            "to": "lightsteem",
+            "amount": "0.001 STEEM",
+            "memo": "test",
+        }), [self.operation, self.operation]]
+        with requests_mock.mock() as m:
+            self.mock_node(m)
+            costs = self.client.rc().get_costs(operations)
+            self.assertEqual(1, len(self.rc_batches))
+
+        self.assertEqual(3, len(costs))
+        for cost in costs:
+            self.assertEqual(
+                sum(cost["cost"].values()), cost["total_cost"])
+        self.assertEqual(0, costs[0]["cost"]["resource_market_bytes"])
+        self.assertGreater(costs[1]["cost"]["resource_market_bytes"], 0)
+        self.assertGreater(costs[2]["total_cost"], costs[0]["total_cost"])
+
+    def test_resource_counter(self):
+        counter = ResourceCounter(mock_resource_params)
+        transaction = {"operations": [
+            ["vote", self.operation.op_data],
+            ["transfer_to_vesting", {}],
+        ]}
+        count = counter.count(transaction, 100)
+
+        self.assertEqual(100, count.resource_history_bytes)
+        self.assertEqual(100, count.resource_market_bytes)
+        self.assertEqual(0, count.resource_new_accounts)
+        self.assertEqual(350000 + 10000 * 100 + 470000,
+                         count.resource_state_bytes)
+        self.assertEqual(
+            count.as_dict(), counter(transaction, 100)["resource_count"])
+
+        with self.assertRaises(AttributeError):
+            counter.count({"operations": [["foo", {}]]}, 100)
+
+    def test_pool_simulator(self):
+        rc_regen = 2000000
+        model = RCModel(mock_resource_params,
+                        mock_resource_pool["resource_pool"], rc_regen)
+        simulator = RCPoolSimulator.from_model(model)
+        names = mock_resource_params["resource_names"]
+        block_counts = [
+            {name: 1000 for name in names},
+            ResourceCount(history_bytes=500, state_bytes=10 ** 6),
+            [0, 0, 0, 0, 0],
+        ]
+
+        for count, (pools, prices) in zip(
+                block_counts, simulator.simulate(block_counts)):
+            if isinstance(count, ResourceCount):
+                count = count.as_dict()
+            elif isinstance(count, list):
+                count = dict(zip(names, count))
+            block_info = model.apply_rc_pool_dynamics(count)
+            self.assertEqual(list(block_info["new_pool"].values()), pools)
+            model.resource_pool = {
+                name: {"pool": pool} for name, pool in zip(names, pools)}
+            self.assertEqual([
+                compute_rc_cost_of_resource(
+                    mock_resource_params["resource_params"][name][
+                        "price_curve_params"],
+                    pool,
+                    mock_resource_params["resource_params"][name][
+                        "resource_dynamics_params"]["resource_unit"],
+                    rc_regen)
+                for name, pool in zip(names, pools)], prices)
+
+        self.assertEqual(3, simulator.block_count)
+
+    def test_transaction_size(self):
+        self.client.keys = [TestBase58.WIF, TestBase58.WIF]
+        with requests_mock.mock() as m:
+            self.mock_node(m)
+            transaction = self.client.broadcast(self.operation, dry_run=True)
+
+        signed_size = len(serialize_transaction(transaction))
+        transaction["signatures"] = []
+        self.assertEqual(signed_size, self.client.rc().get_transaction_size(
+            transaction, signature_count=2))
+
 
 class TestAmountHelper(unittest.TestCase):
 
@@ -387,6 +1505,41 @@ class TestAmountHelper(unittest.TestCase):
             "nai": "@@000000021"
         }, asset_dict)
 
+    def test_asset_dict_precision(self):
+        amount = Amount.from_asset({
+            'amount': '123456789012345678',
+            'precision': 6,
+            'nai': '@@000000037'
+        })
+        self.assertEqual("123456789012.345678 VESTS", str(amount))
+        self.assertEqual('123456789012345678', amount.asset["amount"])
+
+    def test_arithmetic(self):
+        self.assertEqual(
+            Amount("1.500 STEEM"), Amount("1 STEEM") + Amount("0.5 STEEM"))
+        self.assertEqual(
+            Amount("-0.250 SBD"), Amount("0.750 SBD") - Amount("1 SBD"))
+        self.assertEqual(Amount("0.006 STEEM"), sum([
+            Amount("0.001 STEEM"), Amount("0.002 STEEM"),
+            Amount("0.003 STEEM")]))
+        self.assertEqual(
+            Amount("0.0015 STEEM"), Amount("0.001 STEEM") + Amount(
+                "0.0005 STEEM"))
+
+        with self.assertRaises(TypeError):
+            Amount("1.000 STEEM") + Amount("1.000 SBD")
+        with self.assertRaises(TypeError):
+            Amount("1.000 STEEM") + 1
+
+    def test_comparison(self):
+        self.assertLess(Amount("0.001 STEEM"), Amount("0.0011 STEEM"))
+        self.assertGreaterEqual(Amount("1 VESTS"), Amount("1.000000 VESTS"))
+        self.assertNotEqual(Amount("1.000 STEEM"), Amount("1.000 SBD"))
+        self.assertEqual(
+            Amount("1.000 STEEM"),
+            max(Amount("0.100 STEEM"), Amount("1.000 STEEM")))
+        self.assertEqual(1, len({Amount("1 STEEM"), Amount("1.000 STEEM")}))
+
 
 if __name__ == '__main__':
     unittest.main()
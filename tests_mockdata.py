@@ -1035,3 +1035,220 @@ mock_dygp_result = {
         'last_irreversible_block_num': 25926367,
     }
 }
+
+# the unsigned part of the vote transaction in steem-python's
+# serialization tests.
+mock_vote_transaction = {
+    'ref_block_num': 34294,
+    'ref_block_prefix': 3707022213,
+    'expiration': '2016-04-06T08:29:27',
+    'operations': [['vote', {'voter': 'foobara', 'author': 'foobarc',
+                             'permlink': 'foobard', 'weight': 1000}]],
+    'extensions': [],
+    'signatures': [],
+}
+
+mock_vote_transaction_hex = 'f68585abf4dce7c80457010007666f6f6261726107666f' \
+                            '6f6261726307666f6f62617264e8030000'
+
+mock_transfer_transaction = {
+    'ref_block_num': 34294,
+    'ref_block_prefix': 3707022213,
+    'expiration': '2016-04-06T08:29:27',
+    'operations': [['transfer', {'from': 'foo', 'to': 'baar',
+                                 'amount': '111.110 STEEM',
+                                 'memo': 'Fooo'}]],
+    'extensions': [],
+    'signatures': [],
+}
+
+mock_transfer_transaction_hex = 'f68585abf4dce7c80457010203666f6f0462616172' \
+                                '06b201000000000003535445454d000004466f6f' \
+                                '6f0000'
+
+# operations with the special serialization rules. (authorities, public
+# keys, flat sets, extensions, assets and time points.) Hex outputs are from
+# the transaction serialization tests of beem, which are checked against the
+# cli_wallet. (signatures are stripped.)
+key_1 = 'STM6KChDK2sns9MwugxkoRvPEnyjuTxHN5upGsZ1EtanCffqBVVX3'
+key_2 = 'STM7sw22HqsXbz7D2CmJfmMwt9rimtk518dRzsR1f8Cgw52dQR1pR'
+
+mock_serialized_operations = [
+    (['account_update', {
+        'account': 'streemian',
+        'posting': {
+            'weight_threshold': 1,
+            'account_auths': [['xeroc', 1], ['fabian', 1]],
+            'key_auths': [[key_1, 1], [key_2, 1]],
+        },
+        'owner': {
+            'weight_threshold': 1,
+            'account_auths': [],
+            'key_auths': [[key_2, 1], [key_1, 1]],
+        },
+        'active': {
+            'weight_threshold': 2,
+            'account_auths': [],
+            'key_auths': [[key_1, 1], [key_2, 1]],
+        },
+        'memo_key': 'STM728uLvStTeAkYJsQefks3FX8yfmpFHp8wXw3RY3kwey2JGDooR',
+        'json_metadata': '',
+    }], 'f68585abf4dce7c80457010a0973747265656d69616e010100000000'
+        '0202bbcf38855c9ae9d55704ee50ff56552af1242266c10544a75b61'
+        '005e17fa78a601000389d28937022880a7f0c7deaa6f46b4d87ce08b'
+        'd5149335cb39b5a8e9b04981c201000102000000000202bbcf38855c'
+        '9ae9d55704ee50ff56552af1242266c10544a75b61005e17fa78a601'
+        '000389d28937022880a7f0c7deaa6f46b4d87ce08bd5149335cb39b5'
+        'a8e9b04981c201000101000000020666616269616e0100057865726f'
+        '6301000202bbcf38855c9ae9d55704ee50ff56552af1242266c10544'
+        'a75b61005e17fa78a601000389d28937022880a7f0c7deaa6f46b4d8'
+        '7ce08bd5149335cb39b5a8e9b04981c201000318c1ae46b3e98b2668'
+        '4c87737a04ecb1a390efdc7671ced448a92b745372deff000000'),
+    (['comment_options', {
+        'author': 'xeroc',
+        'permlink': 'piston',
+        'max_accepted_payout': '1000000.000 SBD',
+        'percent_steem_dollars': 10000,
+        'allow_votes': True,
+        'allow_curation_rewards': True,
+        'extensions': [[0, {'beneficiaries': [
+            {'weight': 2000, 'account': 'good-karma'},
+            {'weight': 5000, 'account': 'null'},
+        ]}]],
+    }], 'f68585abf4dce7c804570113057865726f6306706973746f6e00ca9a'
+        '3b000000000353424400000000102701010100020a676f6f642d6b61'
+        '726d61d007046e756c6c88130000'),
+    (['custom_json', {
+        'required_auths': [],
+        'required_posting_auths': ['xeroc'],
+        'id': 'follow',
+        'json': '["reblog",{"account":"xeroc","author":"chainsquad",'
+                '"permlink":"streemian-com-to-open-its-doors-and-offer-a-'
+                '20-discount"}]',
+    }], 'f68585abf4dce7c8045701120001057865726f6306666f6c6c6f7779'
+        '5b227265626c6f67222c7b226163636f756e74223a227865726f6322'
+        '2c22617574686f72223a22636861696e7371756164222c227065726d'
+        '6c696e6b223a2273747265656d69616e2d636f6d2d746f2d6f70656e'
+        '2d6974732d646f6f72732d616e642d6f666665722d612d32302d6469'
+        '73636f756e74227d5d0000'),
+    (['limit_order_create', {
+        'owner': '',
+        'orderid': 0,
+        'amount_to_sell': '0.000 STEEM',
+        'min_to_receive': '0.000 STEEM',
+        'fill_or_kill': False,
+        'expiration': '2016-12-31T23:59:59',
+    }], 'f68585abf4dce7c80457010500000000000000000000000000035354'
+        '45454d0000000000000000000003535445454d0000007f4668580000'),
+]
+
+# rc_api.get_resource_params and get_resource_pool results (HF20).
+mock_resource_params = {
+    'resource_names': [
+        'resource_history_bytes', 'resource_new_accounts',
+        'resource_market_bytes', 'resource_state_bytes',
+        'resource_execution_time'],
+    'resource_params': {
+        'resource_history_bytes': {
+            'resource_dynamics_params': {
+                'resource_unit': 1,
+                'budget_per_time_unit': 347222,
+                'pool_eq': '216404314004',
+                'max_pool_size': '432808628008',
+                'decay_params': {'decay_per_time_unit': 3613026481,
+                                 'decay_per_time_unit_denom_shift': 51},
+                'min_decay': 0},
+            'price_curve_params': {'coeff_a': '12981647055416481792',
+                                   'coeff_b': '1690658703', 'shift': 49}},
+        'resource_new_accounts': {
+            'resource_dynamics_params': {
+                'resource_unit': 10000,
+                'budget_per_time_unit': 797,
+                'pool_eq': '157691079',
+                'max_pool_size': '157691079',
+                'decay_params': {'decay_per_time_unit': 347321,
+                                 'decay_per_time_unit_denom_shift': 36},
+                'min_decay': 0},
+            'price_curve_params': {'coeff_a': '12981647055416481792',
+                                   'coeff_b': '1231871', 'shift': 19}},
+        'resource_market_bytes': {
+            'resource_dynamics_params': {
+                'resource_unit': 10,
+                'budget_per_time_unit': 578704,
+                'pool_eq': '16228337695',
+                'max_pool_size': '16228337695',
+                'decay_params': {'decay_per_time_unit': 2604930,
+                                 'decay_per_time_unit_denom_shift': 36},
+                'min_decay': 0},
+            'price_curve_params': {'coeff_a': '12981647055416481792',
+                                   'coeff_b': '126785920', 'shift': 39}},
+        'resource_state_bytes': {
+            'resource_dynamics_params': {
+                'resource_unit': 1,
+                'budget_per_time_unit': 231481481,
+                'pool_eq': '144863534373853',
+                'max_pool_size': '144863534373853',
+                'decay_params': {'decay_per_time_unit': 3613026481,
+                                 'decay_per_time_unit_denom_shift': 51},
+                'min_decay': 0},
+            'price_curve_params': {'coeff_a': '12981647055416481792',
+                                   'coeff_b': '1131746362', 'shift': 53}},
+        'resource_execution_time': {
+            'resource_dynamics_params': {
+                'resource_unit': 1,
+                'budget_per_time_unit': 82191781,
+                'pool_eq': '51436628202164',
+                'max_pool_size': '51436628202164',
+                'decay_params': {'decay_per_time_unit': 3613026481,
+                                 'decay_per_time_unit_denom_shift': 51},
+                'min_decay': 0},
+            'price_curve_params': {'coeff_a': '12981647055416481792',
+                                   'coeff_b': '401852798', 'shift': 52}}},
+    'size_info': {
+        'resource_state_bytes': {
+            'authority_base_size': 40000,
+            'authority_account_member_size': 180000,
+            'authority_key_member_size': 350000,
+            'account_object_base_size': 4800000,
+            'account_authority_object_base_size': 400000,
+            'account_recovery_request_object_base_size': 320000,
+            'comment_object_base_size': 2010000,
+            'comment_object_permlink_char_size': 10000,
+            'comment_object_parent_permlink_char_size': 20000,
+            'comment_object_beneficiaries_member_size': 180000,
+            'comment_vote_object_base_size': 470000,
+            'convert_request_object_base_size': 480000,
+            'decline_voting_rights_request_object_base_size': 280000,
+            'escrow_object_base_size': 1190000,
+            'limit_order_object_base_size': 14490000,
+            'savings_withdraw_object_byte_size': 14490000,
+            'transaction_object_base_size': 350000,
+            'transaction_object_byte_size': 10000,
+            'vesting_delegation_object_base_size': 600000,
+            'vesting_delegation_expiration_object_base_size': 1200000,
+            'withdraw_vesting_route_object_base_size': 430000,
+            'witness_object_base_size': 2660000,
+            'witness_object_url_char_size': 10000,
+            'witness_vote_object_base_size': 400000},
+        'resource_execution_time': {
+            'account_create_operation_exec_time': 57700,
+            'claim_account_operation_exec_time': 10000,
+            'comment_operation_exec_time': 114100,
+            'custom_json_operation_exec_time': 11400,
+            'transfer_operation_exec_time': 9600,
+            'transfer_to_vesting_operation_exec_time': 44400,
+            'vote_operation_exec_time': 26500,
+            'verify_authority_time': 235800}}}
+
+mock_resource_pool = {
+    'resource_pool': {
+        'resource_history_bytes': {'pool': '199338932281'},
+        'resource_new_accounts': {'pool': '37989'},
+        'resource_market_bytes': {'pool': '16228337695'},
+        'resource_state_bytes': {'pool': '138917590458520'},
+        'resource_execution_time': {'pool': '49016398930930'}}}
+
+mock_rc_dygp = {
+    'head_block_number': 25926366,
+    'total_vesting_shares': '397178580536.436419 VESTS',
+}